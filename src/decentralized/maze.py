@@ -165,6 +165,7 @@ class MazeState(AbstractState):
         self._environment = environment
         self._time_remains = time_remains
         self._turn = 0  # The index of which agent should move next
+        self._undo_stack = []  # The (turn, time_remains) before apply_inplace
         self._num_executed_actions = 0
         self._collaborator_actions = {}
         self._collaborator_sigma = {}
@@ -293,6 +294,33 @@ class MazeState(AbstractState):
         new_state.switch_agent()
         return new_state
 
+    @property
+    def supports_inplace(self) -> bool:
+        return True
+
+    def apply_inplace(self, action: MazeAction) -> "MazeState":
+        """ Execute the action on the state itself, so that a rollout moves
+            a single copy instead of deep-copying the paths and the
+            collaborator expectations at every step
+        :param action: The action
+        :return: The state
+        """
+        self._undo_stack.append((self._turn, self._time_remains))
+        self._num_executed_actions += 1
+        self._paths[self._turn].append(action.position)
+        self.switch_agent()
+        return self
+
+    def undo(self) -> "MazeState":
+        """ Revert the last action executed by apply_inplace
+        """
+        if not self._undo_stack:
+            raise ValueError("No action to undo")
+        self._turn, self._time_remains = self._undo_stack.pop()
+        self._num_executed_actions -= 1
+        self._paths[self._turn].pop()
+        return self
+
     @property
     def possible_actions(self) -> list:
         i, j = self._paths[self._turn][-1]
@@ -1,5 +1,7 @@
+import copy
 import math
 import random
+import weakref
 from state import AbstractState as State, AbstractAction as Action
 
 
@@ -24,7 +26,7 @@ class Node(object):
 
     @property
     def parent(self) -> "Node":
-        return self._parent
+        return None if self._parent is None else self._parent()
 
     @property
     def depth(self) -> int:
@@ -59,7 +61,8 @@ class Node(object):
         if action in self._untried_edges:
             self._untried_edges.remove(action)
         self.children[action] = child
-        child._parent = self
+        # A weak link keeps the tree free of reference cycles
+        child._parent = weakref.ref(self)
         return child
 
     def remove_child(self, child: "Node") -> "Node":
@@ -79,7 +82,7 @@ class Node(object):
 
     def __eq__(self, other: "Node") -> bool:
         return (self.__class__ == other.__class__ and
-                self._state == other._state and self._parent == other._parent)
+                self._state == other._state and self.parent == other.parent)
 
     def __str__(self) -> str:
         return str(self._state)
@@ -125,9 +128,15 @@ def default_rollout_policy(state: State) -> float:
     """ The default policy for simulation is to randomly (uniform distribution)
         select an action to update the state and repeat the simulation until
         a terminal state is reached
+        A state that supports apply_inplace is copied once and then mutated
     :param state: The starting state
     :return: The reward at the terminal node
     """
+    if getattr(state, 'supports_inplace', False):
+        state = copy.copy(state)
+        while not state.is_terminal:
+            state.apply_inplace(random.choice(state.possible_actions))
+        return state.reward
     while not state.is_terminal:
         action = random.choice(state.possible_actions)
         state = state.execute_action(action)
@@ -220,41 +229,41 @@ class MonteCarloSearchTree:
         self._root = Node(initial_state)
         self._max_tree_depth = max_tree_depth
 
-    def _search(self, node: Node, search_depth: int = 1) -> (float, list):
-        """ Recursively search for a best sequence of actions
-            :return: The reward of the last (deepest child node) and the
-                     sequence of actions that leads to the optimal child node
+    def _search(self, node: Node, search_depth: int = 1,
+                min_visits: int = 10) -> (float, list):
+        """ Follow the principal variation by robust child: at every step,
+            the child with the most visits (ties broken by the mean reward)
+            extends the sequence, and the search stops at a node whose
+            children all have fewer than min_visits visits; the first step
+            is always taken if node has children
+            :return: The mean reward of the last node and the sequence of
+                     actions that leads to it
         """
-        if not node.children or search_depth == 0:
-            return node.tot_reward / node.num_samples, []
-        elif search_depth == 1:
-            max_val = -math.inf
-            max_actions = []
+        actions = []
+        for step in range(search_depth):
+            best_action, best_key = None, None
             for action, child in node.children.items():
-                node_val = child.tot_reward / child.num_samples
-                if node_val > max_val:
-                    max_val = node_val
-                    max_actions = [action]
-                elif node_val == max_val:
-                    max_actions.append(action)
-            max_action = random.choice(max_actions)
-            child = node.children[max_action]
-            return child.tot_reward / child.num_samples, [max_action]
-        best_reward = -math.inf
-        best_act_seq = []
-        for action, child in node.children.items():
-            child_reward, child_act_seq = self._search(child, search_depth - 1)
-            if child_reward > best_reward:
-                best_act_seq = [action] + child_act_seq
-                best_reward = child_reward
-        return best_reward, best_act_seq
+                if child.num_samples < min_visits and step > 0:
+                    continue
+                key = (child.num_samples, child.tot_reward / child.num_samples,
+                       random.random())
+                if best_key is None or key > best_key:
+                    best_action, best_key = action, key
+            if best_action is None:
+                break
+            actions.append(best_action)
+            node = node.children[best_action]
+        return node.tot_reward / max(node.num_samples, 1), actions
 
     def search_for_actions(self, search_depth: int = 1,
-                           random_seed: int = None) -> list:
+                           random_seed: int = None,
+                           min_visits: int = 10) -> list:
         """ With given initial state, obtain the best actions to take by MCTS
         :param search_depth: How many steps of actions are wanted
         :param random_seed: When not None, set the random seed before running
-        :return: The best actions
+        :param min_visits: The number of visits a node needs to extend the
+            sequence beyond the first action
+        :return: The best actions, at most search_depth of them
         :rtype: A list of AbstractAction objects
         """
         if random_seed is not None:
@@ -265,7 +274,7 @@ class MonteCarloSearchTree:
                           tree_expand_policy=self._tree_expand_policy,
                           rollout_policy=self._rollout_policy,
                           backpropagate_method=self._back_propagate_policy)
-        return self._search(self._root, search_depth)[1]
+        return self._search(self._root, search_depth, min_visits)[1]
 
     def update_root(self, action: Action) -> "MonteCarloSearchTree":
         """ Update the root node to reflect the new state after an action is
@@ -22,3 +22,20 @@ class AbstractState:
 
     def execute_action(self, action: AbstractAction) -> "AbstractState":
         raise NotImplementedError("The method not implemented")
+
+    @property
+    def supports_inplace(self) -> bool:
+        """ Whether the state implements apply_inplace and undo
+        """
+        return False
+
+    def apply_inplace(self, action: AbstractAction) -> "AbstractState":
+        """ Execute the action on the state itself, and remember how to
+            revert it with undo
+        """
+        raise NotImplementedError("The method not implemented")
+
+    def undo(self) -> "AbstractState":
+        """ Revert the last action executed by apply_inplace
+        """
+        raise NotImplementedError("The method not implemented")
@@ -15,6 +15,10 @@ class AbstractAction:
 class AbstractState:
     __metaclass__ = ABCMeta
 
+    # The number of actions after which a random rollout from a state of the
+    # type stops and scores the state with value_estimate; None for no limit
+    rollout_horizon = None
+
     @property
     def reward(self):
         # type: () -> float
@@ -41,4 +45,46 @@ class AbstractState:
         :param action
         :return: The copy of the updated state
         """
+        raise NotImplementedError("The method not implemented")
+
+    @property
+    def supports_inplace(self):
+        # type: () -> bool
+        """ Whether the state implements apply_inplace and undo, which let a
+            rollout mutate a single scratch copy instead of copying the
+            state at every step
+        """
+        return False
+
+    def apply_inplace(self, action):
+        # type: (AbstractAction) -> AbstractState
+        """ Execute the specified action on the state itself, and remember
+            how to revert it with undo
+        :param action
+        :return: The state
+        """
+        raise NotImplementedError("The method not implemented")
+
+    def undo(self):
+        # type: () -> AbstractState
+        """ Revert the last action executed by apply_inplace
+        :return: The state
+        """
+        raise NotImplementedError("The method not implemented")
+
+    def value_estimate(self):
+        # type: () -> float
+        """ An estimate of the final reward from this state, used to score
+            the non-terminal state where a truncated rollout stops
+        :return: The reward of the state by default
+        """
+        return self.reward
+
+    def state_key(self):
+        # type: () -> object
+        """ A hashable key such that two states with equal keys have the
+            same reward and the same future, whatever actions led to them;
+            it lets the search tree share the statistics of such states
+        :return: The key
+        """
         raise NotImplementedError("The method not implemented")
\ No newline at end of file
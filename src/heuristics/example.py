@@ -20,7 +20,10 @@ def simulate(mcts_select_policy, mcts_expand_policy, mcts_rollout_policy,
                                 tree_select_policy=mcts_select_policy,
                                 tree_expand_policy=mcts_expand_policy,
                                 rollout_policy=mcts_rollout_policy,
-                                backpropagate_method=mcts_backpropagate_policy)
+                                backpropagate_method=mcts_backpropagate_policy,
+                                random_seed=rand_seed)
+    # The tree draws from its own random stream; the global random module
+    # is still used by custom policies and the environment
     random.seed(rand_seed)
     state = initial_state.__copy__()
     time = 0
@@ -280,12 +280,18 @@ class KolumboHeuristicsGenerator:
         """
 
         def rollout_policy(state: State) -> float:
+            # A state that supports it is copied once and mutated in place
+            inplace = getattr(state, 'supports_inplace', False)
+            if inplace:
+                state = state.__copy__()
             while not state.is_terminal:
                 actions = state.possible_actions
                 if actions is []:
                     return state.reward
                 elif random.random() < epsilon:
-                    state = state.execute_action(random.choice(actions))
+                    action = random.choice(actions)
+                    state = (state.apply_inplace(action) if inplace else
+                             state.execute_action(action))
                 else:
                     est_rewards = {action: model.predict(
                         self.state_action_to_array(state, action))
@@ -294,10 +300,62 @@ class KolumboHeuristicsGenerator:
                     candidates = [action for action, reward in
                                   est_rewards.items()
                                   if max_reward - reward < max_tol]
-                    state = state.execute_action(random.choice(candidates))
+                    action = random.choice(candidates)
+                    state = (state.apply_inplace(action) if inplace else
+                             state.execute_action(action))
             return state.reward
         return rollout_policy
 
+    def get_batch_evaluator(self, model: Sequential) -> callable:
+        """ Return a batch evaluation function for the batched mode of
+            MonteCarloSearchTree (batch_rollout_policy)
+            The value of a state is its current reward plus the max reward
+            to go estimated by the neural network over its possible actions;
+            all state-action pairs of a batch go through a single predict
+            call
+        :param model: The neural network model
+        :return: The function that maps a list of states to their values
+        """
+
+        def batch_evaluator(states: list) -> list:
+            rows = []
+            owners = []
+            for k, state in enumerate(states):
+                if not state.is_terminal:
+                    for action in state.possible_actions:
+                        rows.append(self.state_action_to_array(state, action))
+                        owners.append(k)
+            values = [state.reward for state in states]
+            if rows:
+                estimates = model.predict(np.vstack(rows))[:, 0]
+                best = np.full(len(states), -np.inf)
+                np.maximum.at(best, owners, estimates)
+                for k in set(owners):
+                    values[k] += float(best[k])
+            return values
+        return batch_evaluator
+
+    def get_prior_policy(self, model: Sequential,
+                         temperature: float = 1.0) -> callable:
+        """ Return the prior policy for the PUCT mode of MonteCarloSearchTree
+            (prior_policy)
+            The priors are the softmax of the rewards estimated by the neural
+            network divided by temperature; all actions of a state go through
+            a single predict call
+        :param model: The neural network model
+        :param temperature: The larger, the closer the priors are to uniform
+        :return: The function that maps a state and its possible actions to
+            their priors
+        """
+
+        def prior_policy(state: State, actions: list) -> np.array:
+            estimates = model.predict(np.vstack(
+                [self.state_action_to_array(state, action)
+                 for action in actions]))[:, 0] / temperature
+            weights = np.exp(estimates - estimates.max())
+            return weights / weights.sum()
+        return prior_policy
+
     def init_neural_network(self, num_layers: int = 10) -> Sequential:
         """ Initialize a neural network without training
         :param num_layers: The number of hidden layers with 10 units
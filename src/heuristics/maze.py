@@ -168,6 +168,7 @@ class MazeState(AbstractState):
         self._environment = environment
         self._time_remains = time_remains
         self._turn = 0  # The index of which agent should move next
+        self._undo_stack = []  # The (turn, time_remains) before apply_inplace
 
     def __copy__(self) -> "MazeState":
         """ Deep copy does not apply to the Environment object because
@@ -252,6 +253,40 @@ class MazeState(AbstractState):
         new_state.switch_agent()
         return new_state
 
+    @property
+    def supports_inplace(self) -> bool:
+        return True
+
+    def apply_inplace(self, action: MazeAction) -> "MazeState":
+        """ Execute the action on the state itself, so that a rollout moves
+            a single copy instead of deep-copying the paths at every step
+        :param action: The action
+        :return: The state
+        """
+        self._undo_stack.append((self._turn, self._time_remains))
+        self._paths[self._turn].append(action.position)
+        self.switch_agent()
+        return self
+
+    def undo(self) -> "MazeState":
+        """ Revert the last action executed by apply_inplace
+        """
+        if not self._undo_stack:
+            raise ValueError("No action to undo")
+        self._turn, self._time_remains = self._undo_stack.pop()
+        self._paths[self._turn].pop()
+        return self
+
+    def state_key(self) -> tuple:
+        """ The positions of the agents, the collected targets, the turn and
+            the remaining time; the rest of the paths does not matter
+        """
+        rewards = self._environment.rewards
+        collected = frozenset(position for position in self.visited
+                              if position in rewards)
+        return (tuple(path[-1] for path in self._paths), collected,
+                self._turn, self._time_remains)
+
     @property
     def possible_actions(self) -> list:
         i, j = self._paths[self._turn][-1]
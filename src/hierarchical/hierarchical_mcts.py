@@ -85,6 +85,19 @@ class Node(object):
             raise ValueError("The node does not have the given child node")
         return self
 
+    def release(self):
+        # type: () -> None
+        """ Detach the node from its parent and break the links of its whole
+            subtree, so that the subtree is freed at once by reference
+            counting instead of waiting for the cyclic garbage collector
+        """
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            stack.extend(node.children.values())
+            node.children = {}
+            node._parent = None
+
     def __eq__(self, other):
         # type: (Node) -> bool
         return (self.__class__ == other.__class__ and
@@ -219,10 +232,12 @@ def execute_round(root, max_tree_depth=15,
             the final reward
     """
     cur = root
-    while cur.is_expanded and cur.depth < max_tree_depth:
+    depth = 1  # Counted from root; update_root keeps the ancestors attached
+    while cur.is_expanded and depth < max_tree_depth:
         act, cur = tree_select_policy(cur, exploration_const=1.0)
+        depth += 1
     simulation_node = tree_expand_policy(
-        cur) if max_tree_depth > cur.depth else cur
+        cur) if max_tree_depth > depth else cur
 
     #if meta_action:# and random.random() < 0.5: # tunable parameter adjusts meta policy following rate
     #    reward = clone_rollout_policy(simulation_node.state, meta_action, meta_action_root, depth_cur)
@@ -236,8 +251,9 @@ class MonteCarloSearchTree:
     def __init__(self, initial_state, samples=1000, max_tree_depth=1000,
                  tree_select_policy=select, tree_expand_policy=expand,
                  rollout_policy=random_rollout_policy,
-                 backpropagate_method=backpropagate, meta_action=None, meta_action_root=None):
-        # type: (AbstractState, int, int, callable, callable, callable, callable) -> None
+                 backpropagate_method=backpropagate, meta_action=None, meta_action_root=None,
+                 keep_ancestors=False):
+        # type: (AbstractState, int, int, callable, callable, callable, callable, object, Node, bool) -> None
         """ Create a MonteCarloSearchTree object
         :param initial_state: The initial state
         :param samples: The number of samples to generate to obtain the best
@@ -258,6 +274,9 @@ class MonteCarloSearchTree:
         :type backpropagate_method: The function that takes a Node (where
             the simulation starts) as input, performs simulation and returns
             the final reward
+        :param keep_ancestors: Whether update_root keeps the old roots and
+            their subtrees attached, which revert_top_root requires;
+            otherwise they are released
         """
         if samples <= 0 or max_tree_depth <= 1:
             raise ValueError("The number of samples must be positive")
@@ -271,6 +290,7 @@ class MonteCarloSearchTree:
         self._max_tree_depth = max_tree_depth
         self._meta_action = meta_action
         self._meta_action_root=meta_action_root
+        self._keep_ancestors = keep_ancestors
 
     def _search(self, node, search_depth=1):
         # type: (Node, int) -> (float, list)
@@ -334,12 +354,21 @@ class MonteCarloSearchTree:
             new_root = self._root.children[action]
         else:
             new_root = self._root.add_child(action)
-        #self._root.remove_child(new_root) # remove ?????
+        if not self._keep_ancestors:
+            self._root.remove_child(new_root)
+            new_root._parent = None
+            self._root.release()
         self._root = new_root
         self._depth_cur += 1
         return self
 
     def revert_top_root(self):
+        # type: () -> Node
+        """ Move the root back to the top of the tree
+        :return: The root before the call
+        """
+        if not self._keep_ancestors:
+            raise ValueError("The ancestors are only kept with keep_ancestors")
         toproot = self._root
         while self._root.parent:
             self._root = self._root.parent
@@ -637,7 +637,8 @@ class FalkorState(AbstractState):
         if self._region_states:
             for loc in self._region_states.keys():
                 #self._meta_roots[self.region_types[loc]] = Node(self._region_states[loc])
-                self._meta_trees[self.region_types[loc]] = MonteCarloSearchTree(self._region_states[loc], samples=100)
+                self._meta_trees[self.region_types[loc]] = MonteCarloSearchTree(self._region_states[loc], samples=100,
+                                                                                 keep_ancestors=True)
 
     def __copy__(self):
         # type: () -> FalkorState
@@ -1,33 +1,388 @@
+import copy
+import functools
+import gc
+import heapq
 import math
+import multiprocessing
 import random
+import sys
+from collections import OrderedDict, namedtuple
+from multiprocessing import shared_memory
+from multiprocessing.connection import Client, Listener, wait
+import threading
+import time
+import weakref
+import numpy as np
 from abs_state import AbstractState, AbstractAction
 
 
-class Node(object):
+# The number of uniforms drawn at once by a RandomStream
+_RANDOM_BLOCK_SIZE = 1024
+
+
+class RandomStream(object):
+    def __init__(self, seed=None, block_size=_RANDOM_BLOCK_SIZE):
+        # type: (int, int) -> None
+        """ A random number generator owned by one tree, so that trees (and
+            the workers of a parallel search) neither share nor perturb the
+            global random state
+            The uniforms are drawn from a NumPy Generator in blocks of
+            block_size and handed out one at a time, and random, randrange
+            and choice are computed from them; the methods mirror those of
+            the random module, which the policies take by default
+        :param seed: The seed, or None to seed from the operating system
+        :param block_size: The number of uniforms drawn at once
+        """
+        if block_size <= 0:
+            raise ValueError("The block size must be positive")
+        self._block_size = block_size
+        self.seed(seed)
+
+    def seed(self, seed=None):
+        # type: (int) -> None
+        """ Restart the stream from seed, discarding the drawn uniforms
+        """
+        self._generator = np.random.default_rng(seed)
+        self._uniforms = iter(())
+
+    def _refill(self):
+        # type: () -> float
+        """ Draw a new block and return its first uniform
+        """
+        self._uniforms = iter(
+            self._generator.random(self._block_size).tolist())
+        return next(self._uniforms)
+
+    def random(self):
+        # type: () -> float
+        """ A uniform number in [0, 1)
+        """
+        try:
+            return next(self._uniforms)
+        except StopIteration:
+            return self._refill()
+
+    def randrange(self, stop):
+        # type: (int) -> int
+        """ A uniform integer in [0, stop)
+        """
+        try:
+            return int(next(self._uniforms) * stop)
+        except StopIteration:
+            return int(self._refill() * stop)
+
+    def choice(self, sequence):
+        # type: (list) -> object
+        """ A uniformly chosen element of a non-empty sequence
+        """
+        try:
+            return sequence[int(next(self._uniforms) * len(sequence))]
+        except StopIteration:
+            return sequence[int(self._refill() * len(sequence))]
+
+    def getrandbits(self, bits):
+        # type: (int) -> int
+        """ An integer of the given number of random bits (at most 63), such
+            as the seed of a worker
+        """
+        return int(self._generator.integers(1 << bits))
+
+    def spawn(self):
+        # type: () -> RandomStream
+        """ An independent stream seeded from this one
+        """
+        return RandomStream(self.getrandbits(63), self._block_size)
+
+
+def _bind_rng(rollout_policy, rng):
+    # type: (callable, RandomStream) -> callable
+    """ The built-in random rollout policy (possibly a functools.partial of
+        it, such as one setting its horizon) drawing from rng; any other
+        policy is returned unchanged
+    """
+    if getattr(rollout_policy, 'func', rollout_policy) in (
+            random_rollout_policy, random_trace_rollout_policy):
+        return functools.partial(rollout_policy, rng=rng)
+    return rollout_policy
+
+
+class _LazyUntriedActions(object):
+    def __init__(self, state, priority=None, rng=random):
+        # type: (AbstractState, callable, RandomStream) -> None
+        """ The untried actions of a node under progressive widening, which
+            are only listed on first use, and then kept in a heap ordered by
+            decreasing priority
+        :param state: The state of the node
+        :param priority: A cheap function that takes a state and one of its
+            actions and returns the priority of the action; when None, the
+            actions are taken in a random order
+        :param rng: The generator of the random order
+        """
+        self._state = state
+        self.priority = priority
+        self._rng = rng
+        self._heap = None
+        self._count = 0  # A tie breaker that keeps the actions uncompared
+
+    def _key(self, action):
+        # type: (AbstractAction) -> float
+        if self.priority is None:
+            return self._rng.random()
+        return -self.priority(self._state, action)
+
+    def _push(self, action):
+        # type: (AbstractAction) -> None
+        heapq.heappush(self._heap, (self._key(action), self._count, action))
+        self._count += 1
+
+    def _materialize(self):
+        # type: () -> list
+        if self._heap is None:
+            self._heap = []
+            for action in self._state.possible_actions:
+                self._push(action)
+        return self._heap
+
+    def best(self):
+        # type: () -> AbstractAction
+        """ The untried action with the highest priority
+        """
+        return self._materialize()[0][2]
+
+    def append(self, action):
+        # type: (AbstractAction) -> None
+        self._materialize()
+        self._push(action)
+
+    def remove(self, action):
+        # type: (AbstractAction) -> None
+        heap = self._materialize()
+        if heap and heap[0][2] == action:
+            heapq.heappop(heap)
+            return
+        for index, entry in enumerate(heap):
+            if entry[2] == action:
+                heap[index] = heap[-1]
+                heap.pop()
+                heapq.heapify(heap)
+                return
+        raise ValueError("The action is not untried")
+
+    def __contains__(self, action):
+        # type: (AbstractAction) -> bool
+        return any(entry[2] == action for entry in self._materialize())
+
+    def __iter__(self):
+        return (entry[2] for entry in sorted(self._materialize()))
+
+    def __len__(self):
+        # type: () -> int
+        return len(self._materialize())
+
+
+class _IndexedUntriedActions(object):
+    def __init__(self, state):
+        # type: (AbstractState) -> None
+        """ The untried actions of a node kept as a mask over the list of the
+            possible actions of the node, so that per-action statistics can
+            be stored in arrays aligned with that list
+        :param state: The state of the node
+        """
+        actions = state.possible_actions
+        self._actions = actions
+        self._index = {action: k for k, action in enumerate(actions)}
+        self._untried = np.ones(len(actions), dtype=bool)
+        self._count = len(actions)
+
+    def choice(self, rng=random):
+        # type: (RandomStream) -> AbstractAction
+        """ An untried action picked uniformly at random
+        """
+        untried = np.flatnonzero(self._untried)
+        return self._actions[int(untried[rng.randrange(len(untried))])]
+
+    def append(self, action):
+        # type: (AbstractAction) -> None
+        k = self._index[action]
+        if not self._untried[k]:
+            self._untried[k] = True
+            self._count += 1
+
+    def remove(self, action):
+        # type: (AbstractAction) -> None
+        k = self._index.get(action)
+        if k is None or not self._untried[k]:
+            raise ValueError("The action is not untried")
+        self._untried[k] = False
+        self._count -= 1
+
+    def __contains__(self, action):
+        # type: (AbstractAction) -> bool
+        k = self._index.get(action)
+        return k is not None and bool(self._untried[k])
+
+    def __iter__(self):
+        return (self._actions[k] for k in np.flatnonzero(self._untried))
+
+    def __len__(self):
+        # type: () -> int
+        return self._count
+
+
+class _PriorUntriedActions(_IndexedUntriedActions):
+    def __init__(self, state, prior_policy):
+        # type: (AbstractState, callable) -> None
+        """ The untried actions of a node under PUCT selection, with the
+            prior probability of every possible action of the node
+            The priors are computed by a single call of prior_policy when
+            the node is first descended into, and are kept, normalized, in
+            a float32 array aligned with the possible actions
+        :param state: The state of the node
+        :param prior_policy: A function that takes a state and the list of
+            its possible actions and returns a probability (or any
+            non-negative weight) for each of them
+        """
+        super(_PriorUntriedActions, self).__init__(state)
+        actions = self._actions
+        priors = np.asarray(prior_policy(state, actions) if actions else [],
+                            dtype=np.float32)
+        total = float(priors.sum())
+        if total > 0:
+            self.priors = priors / total
+        else:
+            self.priors = np.full(len(actions), 1.0 / max(len(actions), 1),
+                                  dtype=np.float32)
+
+    def prior(self, action):
+        # type: (AbstractAction) -> float
+        return float(self.priors[self._index[action]])
+
+    def best(self):
+        # type: () -> AbstractAction
+        """ The untried action with the highest prior
+        """
+        return self._actions[int(np.argmax(
+            np.where(self._untried, self.priors, -1.0)))]
+
+
+class _AmafUntriedActions(_IndexedUntriedActions):
     def __init__(self, state):
         # type: (AbstractState) -> None
+        """ The untried actions of a node under RAVE selection, with the
+            all-moves-as-first (AMAF) statistics of every possible action of
+            the node: the number of samples through the node, since it was
+            first selected from, in which the action was taken later, by the
+            tree or the rollout, and the sum of their rewards, kept in arrays
+            aligned with the possible actions
+        :param state: The state of the node
+        """
+        super(_AmafUntriedActions, self).__init__(state)
+        self.amaf_visits = np.zeros(len(self._actions), dtype=np.int64)
+        self.amaf_rewards = np.zeros(len(self._actions))
+
+    def update(self, actions, reward):
+        # type: (list, float) -> None
+        """ Count a sample of the given reward for each possible action of
+            the node that appears in actions (once, however many times it
+            appears)
+        """
+        index = self._index
+        taken = np.unique(np.fromiter(
+            (index[action] for action in actions if action in index),
+            dtype=np.intp))
+        self.amaf_visits[taken] += 1
+        self.amaf_rewards[taken] += reward
+
+
+class SoftmaxPriors(object):
+    def __init__(self, priority, temperature=1.0):
+        # type: (callable, float) -> None
+        """ A prior policy for PUCT built from a cheap priority function,
+            such as KolumboState.action_priority: the priors are the softmax
+            of the priorities divided by temperature
+        :param priority: A function that takes a state and one of its
+            actions and returns the priority of the action
+        :param temperature: The larger, the closer the priors are to uniform
+        """
+        if temperature <= 0:
+            raise ValueError("The temperature must be positive")
+        self.priority = priority
+        self.temperature = temperature
+
+    def __call__(self, state, actions):
+        # type: (AbstractState, list) -> np.ndarray
+        scores = np.array([self.priority(state, action) for action in actions],
+                          dtype=np.float64) / self.temperature
+        weights = np.exp(scores - scores.max())
+        return weights / weights.sum()
+
+
+def _widening_limit(widening, num_samples):
+    # type: ((float, float), int) -> float
+    """ The number of children allowed to a node with num_samples visits by
+        progressive widening (k, alpha): k * num_samples ** alpha, and at
+        least one
+    """
+    return max(1.0, widening[0] * num_samples ** widening[1])
+
+
+class Node(object):
+    def __init__(self, state, make_untried=None, parent=None, action=None):
+        # type: (AbstractState, callable, Node, AbstractAction) -> None
         """ Create a Node object with given state
+            The state may be left to be built from the state of the parent
+            and the action on first use, and the untried actions are only
+            listed when the node is first descended into, so that leaves
+            that are never selected again cost neither
+        :param state: The state, or None to build it on first use
+        :param make_untried: A function that takes the state and returns
+            its untried actions (such as a _LazyUntriedActions), when not
+            the list of its possible actions
+        :param parent: The parent node, which is only referenced weakly, so
+            that the tree has no reference cycle: the cyclic garbage
+            collector then has nothing to find in it, and a pruned subtree
+            is freed by reference counting
+        :param action: The action that leads from the parent to the node
         """
         self._state = state
-        self._parent = None
-        self._untried_edges = self._state.possible_actions
+        self._parent = None if parent is None else weakref.ref(parent)
+        self._action = action
+        self._make_untried = make_untried
+        self._untried = None
         self.children = {}  # {AbstractAction: AbstractState}
         self.tot_reward = 0
+        self.tot_sq_reward = 0.0  # The sum of squared rewards
         self.num_samples = 0
 
     @property
     def state(self):
         # type: () -> AbstractState
+        if self._state is None:
+            parent = self.parent
+            if parent is None:
+                # A released (or orphaned) node can no longer build its state
+                raise ValueError("The state of the node was not built before "
+                                 "it was released from its parent")
+            self._state = parent.state.execute_action(self._action)
         return self._state
 
+    @property
+    def _untried_edges(self):
+        # type: () -> list
+        if self._untried is None:
+            self._untried = (self.state.possible_actions if
+                             self._make_untried is None else
+                             self._make_untried(self.state))
+        return self._untried
+
     @property
     def is_terminal(self):
-        return self._state.is_terminal
+        return self.state.is_terminal
 
     @property
     def parent(self):
         # type: () -> Node
-        return self._parent
+        return None if self._parent is None else self._parent()
 
     @property
     def depth(self):
@@ -47,6 +402,16 @@ class Node(object):
         # type: () -> list
         return self._untried_edges
 
+    @property
+    def variance(self):
+        # type: () -> float
+        """ The variance of the rewards sampled through the node
+        """
+        if self.num_samples == 0:
+            return 0.0
+        mean = self.tot_reward / self.num_samples
+        return max(self.tot_sq_reward / self.num_samples - mean * mean, 0.0)
+
     @property
     def is_expanded(self):
         # type: () -> bool
@@ -54,6 +419,16 @@ class Node(object):
         """
         return len(self._untried_edges) == 0
 
+    def new_child_node(self, action, state=None):
+        # type: (AbstractAction, AbstractState) -> Node
+        """ Create a child node reached by action, whose untried actions are
+            kept the same way as those of this node; the child is not added
+            to the children
+        :param state: The state of the child, or None to build it on first
+            use
+        """
+        return Node(state, self._make_untried, self, action)
+
     def add_child(self, action):
         # type: (AbstractAction) -> Node
         """ Add a child node and set the parent of the child node and return the
@@ -62,11 +437,10 @@ class Node(object):
             node
         :return: The child node
         """
-        child = Node(self._state.execute_action(action))
+        child = self.new_child_node(action)
         if action in self._untried_edges:
             self._untried_edges.remove(action)
         self.children[action] = child
-        child._parent = self
         return child
 
     def remove_child(self, child):
@@ -76,7 +450,8 @@ class Node(object):
         """
         act = None
         for action, node in self.children.items():
-            if node == child:
+            if node is child:
+                child.state  # Materialized while the parent is still known
                 child._parent = None
                 act = action
         if act:
@@ -85,22 +460,113 @@ class Node(object):
             raise ValueError("The node does not have the given child node")
         return self
 
+    def release(self):
+        # type: () -> int
+        """ Detach the node from its parent and break the links of its whole
+            subtree, so that the nodes of the subtree are freed one by one
+            instead of in one deep chain of deallocations
+        :return: The number of nodes released, the node included
+        """
+        released = 0
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            stack.extend(node.children.values())
+            node.children = {}
+            node._parent = None
+            released += 1
+        return released
+
     def __eq__(self, other):
         # type: (Node) -> bool
         return (self.__class__ == other.__class__ and
-                self._state == other._state and self._parent == other._parent)
+                self.state == other.state and self.parent == other.parent)
 
     def __str__(self):
         # type: () -> str
         return str(self._state)
 
 
-def select(node, exploration_const=1.0):
-    # type: (Node, float) -> (AbstractAction, Node)
+class OpenLoopNode(object):
+    # Slots keep the node down to its statistics and children
+    __slots__ = ('children', 'num_samples', 'tot_reward', 'tot_sq_reward',
+                 'state')
+
+    def __init__(self, state=None):
+        # type: (AbstractState) -> None
+        """ A node of an open-loop tree, which stores the statistics of the
+            sequence of actions from the root but no state; the states are
+            replayed from the root state during the descent (see
+            _open_loop_round), except at the root and at the nodes where a
+            materialized state is cached
+            The untried actions are the possible actions of the replayed
+            state that are not children yet, and there is no parent link
+        :param state: The state to keep, or None
+        """
+        self.children = {}  # {AbstractAction: OpenLoopNode}
+        self.num_samples = 0
+        self.tot_reward = 0.0
+        self.tot_sq_reward = 0.0
+        self.state = state
+
+
+class _OpenLoopStateCache(object):
+    def __init__(self, min_visits, max_states):
+        # type: (int, int) -> None
+        """ The states kept by the nodes of an open-loop tree: a node that
+            has been visited at least min_visits times keeps its state, and
+            when more than max_states nodes keep one, the state of the least
+            recently used node is dropped (it is replayed again)
+        :param min_visits: The number of visits from which a node keeps its
+            state
+        :param max_states: The maximal number of kept states
+        """
+        if max_states <= 0:
+            raise ValueError("The number of cached states must be positive")
+        self.min_visits = min_visits
+        self._max_states = max_states
+        self._nodes = OrderedDict()  # {id(OpenLoopNode): OpenLoopNode}
+
+    def __len__(self):
+        # type: () -> int
+        return len(self._nodes)
+
+    def touch(self, node):
+        # type: (OpenLoopNode) -> None
+        """ Mark the state of node as recently used
+        """
+        if id(node) in self._nodes:
+            self._nodes.move_to_end(id(node))
+
+    def put(self, node, state):
+        # type: (OpenLoopNode, AbstractState) -> None
+        """ Keep state in node, dropping the least recently used state when
+            the cache is full
+        """
+        node.state = state
+        self._nodes[id(node)] = node
+        if len(self._nodes) > self._max_states:
+            _, old = self._nodes.popitem(last=False)
+            old.state = None
+
+    def drop(self, node_ids):
+        # type: (set) -> None
+        """ Forget the nodes whose ids are in node_ids (the pruned nodes, or
+            the new root, which keeps its state), without dropping their
+            states
+        """
+        for node_id in node_ids:
+            self._nodes.pop(node_id, None)
+
+
+def select(node, exploration_const=1.0, rng=random):
+    # type: (Node, float, RandomStream) -> (AbstractAction, Node)
     """ Select the best child node based on UCB; if there are multiple
         child nodes with the max UCB, randomly select one
     :param node: The parent node
     :param exploration_const: The exploration constant in UCB formula
+    :param rng: The generator that breaks ties (a RandomStream, or the
+        random module)
     :return: The action and the corresponding best child node
     """
     max_val = -float('inf')
@@ -115,36 +581,109 @@ def select(node, exploration_const=1.0):
             max_actions = [action]
         elif node_val == max_val:
             max_actions.append(action)
-    max_action = random.choice(max_actions)
+    max_action = rng.choice(max_actions)
     return max_action, node.children[max_action]
 
 
-def expand(node):
-    # type: (Node) -> Node
+def expand(node, rng=random):
+    # type: (Node, RandomStream) -> Node
     """ Randomly select an untried action and create a child node based on it
         Return the new child node
     :param node: The parent node
+    :param rng: The generator that picks the action
     :return: The child node
     """
     if node.is_expanded:
         raise Exception("Should not expand a node that has already"
                         " been expanded")
-    action = random.choice(node.unused_edges)
+    action = rng.choice(node.unused_edges)
     return node.add_child(action)
 
 
-def random_rollout_policy(state):
-    # type: (AbstractState) -> float
+def _truncated_value(state, value_estimator=None):
+    # type: (AbstractState, callable) -> float
+    """ The reward of a terminal state, or the value of a state where a
+        rollout was cut short, by value_estimator or else by the
+        value_estimate of the state
+    """
+    if state.is_terminal:
+        return state.reward
+    if value_estimator is not None:
+        return value_estimator(state)
+    estimate = getattr(state, 'value_estimate', None)
+    return state.reward if estimate is None else estimate()
+
+
+def random_rollout_policy(state, rng=random, horizon=None,
+                          value_estimator=None):
+    # type: (AbstractState, RandomStream, int, callable) -> float
     """ The default policy for simulation is to randomly (uniform distribution)
         select an action to update the state and repeat the simulation until
         a terminal state is reached
+        A state that supports apply_inplace is copied once and then mutated,
+        instead of being copied by execute_action at every step
     :param state: The starting state
-    :return: The reward at the terminal node
+    :param rng: The generator that picks the actions; the tree binds its
+        own RandomStream
+    :param horizon: When not None, the number of actions after which the
+        simulation stops and the state is scored by the value estimator;
+        defaults to the rollout_horizon of the state type
+    :param value_estimator: A function that takes a non-terminal state and
+        returns an estimate of its final reward; defaults to the
+        value_estimate of the state
+    :return: The reward at the terminal node, or the estimate
     """
-    while not state.is_terminal:
-        action = random.choice(state.possible_actions)
-        state = state.execute_action(action)
-    return state.reward
+    choice = rng.choice
+    if horizon is None:
+        horizon = getattr(state, 'rollout_horizon', None)
+    if horizon is None:
+        if getattr(state, 'supports_inplace', False):
+            state = copy.copy(state)
+            while not state.is_terminal:
+                state.apply_inplace(choice(state.possible_actions))
+            return state.reward
+        while not state.is_terminal:
+            action = choice(state.possible_actions)
+            state = state.execute_action(action)
+        return state.reward
+    steps = horizon
+    if getattr(state, 'supports_inplace', False):
+        state = copy.copy(state)
+        while steps > 0 and not state.is_terminal:
+            state.apply_inplace(choice(state.possible_actions))
+            steps -= 1
+    else:
+        while steps > 0 and not state.is_terminal:
+            state = state.execute_action(choice(state.possible_actions))
+            steps -= 1
+    return _truncated_value(state, value_estimator)
+
+
+def random_trace_rollout_policy(state, rng=random, horizon=None,
+                                value_estimator=None):
+    # type: (AbstractState, RandomStream, int, callable) -> (float, list)
+    """ The random rollout policy that also returns the actions it took, for
+        the RAVE mode of MonteCarloSearchTree
+    :return: The reward at the terminal node (or the estimate when cut short
+        by the horizon) and the list of the actions
+    """
+    choice = rng.choice
+    if horizon is None:
+        horizon = getattr(state, 'rollout_horizon', None)
+    steps = sys.maxsize if horizon is None else horizon
+    trace = []
+    inplace = getattr(state, 'supports_inplace', False)
+    if inplace:
+        state = copy.copy(state)
+    while steps > 0 and not state.is_terminal:
+        action = choice(state.possible_actions)
+        trace.append(action)
+        if inplace:
+            state.apply_inplace(action)
+        else:
+            state = state.execute_action(action)
+        steps -= 1
+    return _truncated_value(state, value_estimator), trace
 
 
 def backpropagate(node, reward=0.0):
@@ -154,19 +693,541 @@ def backpropagate(node, reward=0.0):
     :param node: The node where the reward starts
     :param reward: The reward at the terminal state
     """
+    sq_reward = _squared(reward)
     while node is not None:
         node.num_samples += 1
         node.tot_reward += reward
+        node.tot_sq_reward += sq_reward
         node = node.parent
 
 
+def _uses_builtin_policies(tree_select_policy, tree_expand_policy,
+                           backpropagate_method):
+    # type: (callable, callable, callable) -> bool
+    """ Whether the tree and backpropagation policies are the built-in
+        select, expand and backpropagate, which the fused round kernels and
+        the other backends implement themselves
+    """
+    return (tree_select_policy is select and tree_expand_policy is expand and
+            backpropagate_method is backpropagate)
+
+
+def _estimate_node_bytes(node):
+    # type: (Node) -> int
+    """ A rough (shallow) estimate of the memory taken by a node and its
+        state, in bytes; an open-loop node is counted without a state
+    """
+    if isinstance(node, OpenLoopNode):
+        return (sys.getsizeof(node) + sys.getsizeof(node.children) +
+                3 * sys.getsizeof(0.0))
+    size = 0
+    for obj in (node, node.state):
+        size += sys.getsizeof(obj)
+        attributes = getattr(obj, '__dict__', {})
+        size += sys.getsizeof(attributes)
+        size += sum(sys.getsizeof(value) for value in attributes.values())
+    return size
+
+
+class TranspositionTable(object):
+    def __init__(self, max_entries=100000):
+        # type: (int) -> None
+        """ A table of nodes keyed by AbstractState.state_key, which turns
+            the search tree into a DAG: a state reached by several sequences
+            of actions gets a single node whose statistics are shared by all
+            of its parents
+            When the table is full, the least recently used entry is dropped
+            (its node stays in the tree, but is no longer shared)
+        :param max_entries: The maximal number of entries
+        """
+        if max_entries <= 0:
+            raise ValueError("The number of entries must be positive")
+        self._max_entries = max_entries
+        self._nodes = OrderedDict()
+        self._node_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        # type: () -> int
+        return len(self._nodes)
+
+    @property
+    def hit_rate(self):
+        # type: () -> float
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    @property
+    def memory_saved(self):
+        # type: () -> int
+        """ An estimate of the bytes saved by the nodes that were shared
+            instead of created
+        """
+        return self.hits * self._node_bytes
+
+    def get(self, key):
+        # type: (object) -> Node
+        """ The node stored under key, or None
+        """
+        node = self._nodes.get(key)
+        if node is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._nodes.move_to_end(key)
+        return node
+
+    def put(self, key, node):
+        # type: (object, Node) -> None
+        if not self._node_bytes:
+            self._node_bytes = _estimate_node_bytes(node)
+        if len(self._nodes) >= self._max_entries:
+            self._nodes.popitem(last=False)
+            self.evictions += 1
+        self._nodes[key] = node
+
+    def clear(self):
+        # type: () -> None
+        self._nodes.clear()
+
+    def retain(self, root):
+        # type: (Node) -> int
+        """ Drop the entries whose node is no longer reachable from root, such
+            as after the root moved down, and keep the others in their order
+        :return: The number of nodes reachable from root
+        """
+        reachable = set()
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            if id(node) not in reachable:
+                reachable.add(id(node))
+                stack.extend(node.children.values())
+        for key in [key for key, node in self._nodes.items()
+                    if id(node) not in reachable]:
+            del self._nodes[key]
+        return len(reachable)
+
+    def add_child(self, node, action):
+        # type: (Node, AbstractAction) -> Node
+        """ Like Node.add_child, except that the child is taken from the
+            table when a node of an equivalent state exists
+        """
+        state = node.state.execute_action(action)
+        key = state.state_key()
+        child = self.get(key)
+        if child is None:
+            child = node.new_child_node(action, state)
+            self.put(key, child)
+        if action in node._untried_edges:
+            node._untried_edges.remove(action)
+        node.children[action] = child
+        return child
+
+
+# The number of hits of a cache entry between two fresh rollouts blended
+# into its mean
+_CACHE_REFRESH_INTERVAL = 16
+
+
+class _CachedReward(float):
+    # The second moment of the rollouts of the state whose cached mean this
+    # is, backpropagated instead of the square of the mean
+    __slots__ = ('sq_reward',)
+
+
+def _squared(reward):
+    # type: (float) -> float
+    """ The squared reward to backpropagate with reward: a cached mean
+        reward adds the second moment of the rewards it stands for, so that
+        it does not shrink the variance of the nodes as if it were a fresh
+        sample of that very value
+    """
+    return getattr(reward, 'sq_reward', reward * reward)
+
+
+class RolloutCache(object):
+    def __init__(self, max_entries=100000, deterministic=False, min_count=3,
+                 max_std_error=0.0, max_bytes=None):
+        # type: (int, bool, int, float, int) -> None
+        """ An LRU cache of rollout results keyed by AbstractState.state_key,
+            which keeps the mean reward, the number of rollouts and the
+            variance of the rewards of each state
+            With a deterministic rollout policy (such as a greedy or neural
+            one), the reward of the first rollout of a state is returned
+            from then on
+            With a stochastic policy, a state is simulated, and its reward
+            blended into the mean, until its mean is trusted: at least
+            min_count rollouts and a standard error of at most
+            max_std_error; from then on, the cached mean is returned instead
+            of simulating, except for one fresh rollout every
+            _CACHE_REFRESH_INTERVAL hits, which is blended in as well
+            By default, the mean of a stochastic policy is never trusted, so
+            the cache only saves simulations once a positive max_std_error
+            trades some noise for them
+        :param max_entries: The maximal number of entries
+        :param deterministic: Whether the rollout policy always returns the
+            same reward for a state
+        :param min_count: The number of rollouts of a state before its cached
+            mean may be used, at least 3 for a stochastic policy
+        :param max_std_error: The standard error of the mean, in units of
+            reward, below which the cached mean is used; a stochastic
+            policy needs it positive to use the cache
+        :param max_bytes: When not None, a further bound on the entries
+            given as an estimate of their memory
+        """
+        if max_entries <= 0 or min_count <= 0:
+            raise ValueError("The number of entries and the count must be "
+                             "positive")
+        if not deterministic and min_count < 3:
+            raise ValueError("The count of a stochastic rollout policy must "
+                             "be at least 3")
+        if max_std_error < 0:
+            raise ValueError("The standard error cannot be negative")
+        self._max_entries = max_entries
+        self._deterministic = deterministic
+        self._min_count = min_count
+        self._max_variance = max_std_error * max_std_error
+        self._max_bytes = max_bytes
+        # {key: [mean, count, sum of squared deviations, hits]}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        # type: () -> int
+        return len(self._entries)
+
+    @property
+    def hit_rate(self):
+        # type: () -> float
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def _limit_bytes(self, key, entry):
+        # type: (object, list) -> None
+        """ Turn the byte budget into a number of entries, from the size of
+            the first entry
+        """
+        entry_bytes = (sys.getsizeof(key) + sys.getsizeof(entry) +
+                       sum(sys.getsizeof(item) for item in entry))
+        if isinstance(key, tuple):
+            entry_bytes += sum(sys.getsizeof(item) for item in key)
+        self._max_entries = max(1, min(self._max_entries,
+                                       self._max_bytes // entry_bytes))
+        self._max_bytes = None
+
+    def _trusted(self, entry):
+        # type: (list) -> bool
+        """ Whether the mean of an entry is precise enough to be used: the
+            variance of the mean (the sample variance over the count) is
+            compared with max_std_error squared
+        """
+        count = entry[1]
+        return count >= self._min_count and self._max_variance > 0 and (
+            entry[2] / (count - 1) / count <= self._max_variance)
+
+    def rollout(self, rollout_policy, state):
+        # type: (callable, AbstractState) -> float
+        """ The reward of state: the cached one under a deterministic policy,
+            the cached mean (as a _CachedReward) when it is trusted, or else
+            the reward of a new rollout, which is blended into the mean
+        """
+        key = state.state_key()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                if self._deterministic:
+                    self.hits += 1
+                    return entry[0]
+                if self._trusted(entry):
+                    entry[3] += 1
+                    if entry[3] % _CACHE_REFRESH_INTERVAL:
+                        self.hits += 1
+                        reward = _CachedReward(entry[0])
+                        reward.sq_reward = (entry[0] * entry[0] +
+                                            entry[2] / entry[1])
+                        return reward
+            self.misses += 1
+        reward = rollout_policy(state)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = [0.0, 0, 0.0, 0]
+                if self._max_bytes is not None:
+                    self._limit_bytes(key, entry)
+                while len(self._entries) >= self._max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+                self._entries[key] = entry
+            entry[1] += 1
+            delta = reward - entry[0]
+            entry[0] += delta / entry[1]
+            entry[2] += delta * (reward - entry[0])
+        return reward
+
+    def clear(self):
+        # type: () -> None
+        with self._lock:
+            self._entries.clear()
+
+
+def _fused_round(root, max_tree_depth, rollout_policy, path,
+                 transpositions=None, widening=None, rng=random):
+    # type: (Node, int, callable, list, TranspositionTable, (float, float), RandomStream) -> Node
+    """ The built-in select, expand and backpropagate fused into one loop
+        The descent is recorded in path (a buffer reused between rounds), so
+        the depth relative to root is known in O(1) and backpropagation walks
+        the recorded path instead of the parent links, which also makes it
+        correct for nodes shared through a transposition table
+        With progressive widening (k, alpha), a node is expanded (with its
+        untried action of highest priority) only while it has fewer than
+        _widening_limit children, and its children are selected otherwise
+    """
+    del path[:]
+    cur = root
+    path.append(cur)
+    depth = 1
+    expanding = False
+    while depth < max_tree_depth:
+        if ((widening is None or len(cur.children) <
+             _widening_limit(widening, cur.num_samples)) and
+                cur._untried_edges):
+            expanding = True
+            break
+        children = cur.children
+        if not children:
+            break
+        log_n = 2.0 * math.log(cur.num_samples)
+        max_val = -float('inf')
+        max_children = []
+        for child in children.values():
+            node_val = (child.tot_reward / child.num_samples +
+                        math.sqrt(log_n / child.num_samples))
+            if node_val > max_val:
+                max_val = node_val
+                max_children = [child]
+            elif node_val == max_val:
+                max_children.append(child)
+        cur = (max_children[0] if len(max_children) == 1 else
+               rng.choice(max_children))
+        path.append(cur)
+        depth += 1
+    if expanding:
+        action = (rng.choice(cur._untried_edges) if widening is None else
+                  cur._untried_edges.best())
+        if transpositions is None:
+            cur = cur.add_child(action)
+        else:
+            cur = transpositions.add_child(cur, action)
+        path.append(cur)
+    reward = rollout_policy(cur.state)
+    sq_reward = _squared(reward)
+    for node in path:
+        node.num_samples += 1
+        node.tot_reward += reward
+        node.tot_sq_reward += sq_reward
+    return cur
+
+
+def _open_loop_round(root, max_tree_depth, rollout_policy, path,
+                     state_cache=None, rng=random):
+    # type: (OpenLoopNode, int, callable, list, _OpenLoopStateCache, RandomStream) -> OpenLoopNode
+    """ The built-in select, expand and backpropagate on an open-loop tree:
+        the state of every node on the descent is derived by executing its
+        action on the state of its parent, starting from the state kept at
+        root
+    :param state_cache: When not None, the _OpenLoopStateCache that keeps
+        the states of the nodes visited often enough, which are then reused
+        instead of being replayed
+    """
+    del path[:]
+    cur = root
+    state = root.state
+    path.append(cur)
+    depth = 1
+    while depth < max_tree_depth and not state.is_terminal:
+        actions = state.possible_actions
+        children = cur.children
+        if len(children) < len(actions):
+            action = rng.choice([action for action in actions
+                                 if action not in children])
+            state = state.execute_action(action)
+            cur = children[action] = OpenLoopNode()
+            path.append(cur)
+            break
+        log_n = 2.0 * math.log(cur.num_samples)
+        max_val = -float('inf')
+        max_actions = []
+        for action, child in children.items():
+            node_val = (child.tot_reward / child.num_samples +
+                        math.sqrt(log_n / child.num_samples))
+            if node_val > max_val:
+                max_val = node_val
+                max_actions = [action]
+            elif node_val == max_val:
+                max_actions.append(action)
+        action = (max_actions[0] if len(max_actions) == 1 else
+                  rng.choice(max_actions))
+        cur = children[action]
+        if cur.state is not None:
+            state = cur.state
+            if state_cache is not None:
+                state_cache.touch(cur)
+        else:
+            state = state.execute_action(action)
+            if (state_cache is not None and
+                    cur.num_samples >= state_cache.min_visits):
+                state_cache.put(cur, state)
+        path.append(cur)
+        depth += 1
+    reward = rollout_policy(state)
+    sq_reward = _squared(reward)
+    for node in path:
+        node.num_samples += 1
+        node.tot_reward += reward
+        node.tot_sq_reward += sq_reward
+    return cur
+
+
+def _puct_round(root, max_tree_depth, rollout_policy, path, puct_const=1.0,
+                rng=random):
+    # type: (Node, int, callable, list, float, RandomStream) -> Node
+    """ The built-in select, expand and backpropagate with PUCT: a child of
+        a node visited N times has the value
+        mean + puct_const * prior * sqrt(N) / (1 + visits)
+        and the untried action with the highest prior competes with the
+        children as a child without visits whose mean is that of the node;
+        the node is expanded when that action has the max value, so that
+        actions of low prior may never be expanded
+        The untried actions of the nodes are _PriorUntriedActions
+    """
+    del path[:]
+    cur = root
+    path.append(cur)
+    depth = 1
+    expanding = False
+    while depth < max_tree_depth:
+        untried = cur._untried_edges
+        children = cur.children
+        if not children:
+            expanding = bool(untried)
+            break
+        sqrt_n = math.sqrt(cur.num_samples)
+        priors, index = untried.priors, untried._index
+        max_val = -float('inf')
+        max_children = []
+        for action, child in children.items():
+            node_val = (child.tot_reward / child.num_samples +
+                        puct_const * float(priors[index[action]]) * sqrt_n /
+                        (1 + child.num_samples))
+            if node_val > max_val:
+                max_val = node_val
+                max_children = [child]
+            elif node_val == max_val:
+                max_children.append(child)
+        if untried and (cur.tot_reward / cur.num_samples + puct_const *
+                        untried.prior(untried.best()) * sqrt_n >= max_val):
+            expanding = True
+            break
+        cur = (max_children[0] if len(max_children) == 1 else
+               rng.choice(max_children))
+        path.append(cur)
+        depth += 1
+    if expanding:
+        cur = cur.add_child(cur._untried_edges.best())
+        path.append(cur)
+    reward = rollout_policy(cur.state)
+    sq_reward = _squared(reward)
+    for node in path:
+        node.num_samples += 1
+        node.tot_reward += reward
+        node.tot_sq_reward += sq_reward
+    return cur
+
+
+def _rave_round(root, max_tree_depth, rollout_policy, path, equivalence,
+                rng=random):
+    # type: (Node, int, callable, list, float, RandomStream) -> Node
+    """ The built-in select, expand and backpropagate with RAVE: the value of
+        a child in UCB1 is (1 - beta) * mean + beta * amaf_mean, where
+        amaf_mean is the all-moves-as-first mean of its action kept by the
+        parent and beta = sqrt(equivalence / (3 * visits + equivalence))
+        goes from 1 to 0 as the child gathers samples of its own
+        The rollout policy returns the reward and the actions it took; every
+        node on the path then counts the sample for each of its possible
+        actions taken later on the path or in the rollout
+        The untried actions of the nodes are _AmafUntriedActions, which are
+        only built when a node is first selected from, so that the new leaf
+        of a round neither lists its possible actions nor counts its first
+        sample in AMAF statistics
+    """
+    del path[:]
+    cur = root
+    path.append(cur)
+    depth = 1
+    while depth < max_tree_depth:
+        if cur._untried_edges:
+            cur = cur.add_child(cur._untried_edges.choice(rng))
+            path.append(cur)
+            break
+        children = cur.children
+        if not children:
+            break
+        edges = cur._untried_edges
+        amaf_visits, amaf_rewards = edges.amaf_visits, edges.amaf_rewards
+        index = edges._index
+        log_n = 2.0 * math.log(cur.num_samples)
+        max_val = -float('inf')
+        max_children = []
+        for action, child in children.items():
+            visits = child.num_samples
+            node_val = child.tot_reward / visits
+            k = index[action]
+            if amaf_visits[k]:
+                beta = math.sqrt(equivalence / (3 * visits + equivalence))
+                node_val += beta * (float(amaf_rewards[k]) / amaf_visits[k] -
+                                    node_val)
+            node_val += math.sqrt(log_n / visits)
+            if node_val > max_val:
+                max_val = node_val
+                max_children = [child]
+            elif node_val == max_val:
+                max_children.append(child)
+        cur = (max_children[0] if len(max_children) == 1 else
+               rng.choice(max_children))
+        path.append(cur)
+        depth += 1
+    reward, trace = rollout_policy(cur.state)
+    sq_reward = reward * reward
+    later = list(trace)
+    for k in range(len(path) - 1, -1, -1):
+        node = path[k]
+        node.num_samples += 1
+        node.tot_reward += reward
+        node.tot_sq_reward += sq_reward
+        if node._untried is not None and not node.is_terminal:
+            node._untried.update(later, reward)
+        later.append(node._action)
+    return cur
+
+
 def execute_round(root, max_tree_depth=15,
                   tree_select_policy=select, tree_expand_policy=expand,
                   rollout_policy=random_rollout_policy,
-                  backpropagate_method=backpropagate):
-    # type: (Node, int, callable, callable, callable, callable) -> None
+                  backpropagate_method=backpropagate, path=None,
+                  transpositions=None, widening=None, rng=random):
+    # type: (Node, int, callable, callable, callable, callable, list, TranspositionTable, (float, float), RandomStream) -> Node
     """ Perform selection, expansion, simulation and backpropagation with
         one sample
+        The depth is counted from root, whether or not root has a parent
+        When the built-in select, expand and backpropagate are used, they
+        run fused in a single loop (see _fused_round)
         :param root: The Node object from which the select step starts
         :param max_tree_depth: Expansion will not occur if the maximum tree
             depth is reached
@@ -186,22 +1247,1142 @@ def execute_round(root, max_tree_depth=15,
         :type backpropagate_method: The function that takes a Node (where
             the simulation starts) as input, performs simulation and returns
             the final reward
+        :param path: A list reused by the fused loop to record the descent;
+            when None, a new list is used
+        :param transpositions: When not None, the table used by the fused
+            loop to share the nodes of equivalent states; only supported
+            with the built-in policies
+        :param widening: When not None, the (k, alpha) of progressive
+            widening in the fused loop, where the untried actions of the
+            nodes are _LazyUntriedActions; only supported with the built-in
+            policies
+        :param rng: The generator of the fused loop (a RandomStream, or the
+            random module)
+        :return: The node where the simulation started
     """
+    if _uses_builtin_policies(tree_select_policy, tree_expand_policy,
+                              backpropagate_method):
+        return _fused_round(root, max_tree_depth, rollout_policy,
+                            [] if path is None else path, transpositions,
+                            widening, rng)
+    if transpositions is not None or widening is not None:
+        raise ValueError("A transposition table and progressive widening "
+                         "require the built-in policies")
     cur = root
-    while cur.is_expanded and cur.depth < max_tree_depth:
+    depth = 1
+    while cur.is_expanded and depth < max_tree_depth:
         act, cur = tree_select_policy(cur, exploration_const=1.0)
+        depth += 1
     simulation_node = tree_expand_policy(
-        cur) if max_tree_depth > cur.depth else cur
+        cur) if max_tree_depth > depth else cur
     reward = rollout_policy(simulation_node.state)
     backpropagate_method(simulation_node, reward)
+    return simulation_node
+
+
+# The maximal number of rounds between two reads of the clock
+_DEADLINE_CHECK_INTERVAL = 16
+
+
+class _Deadline(object):
+    def __init__(self, deadline):
+        # type: (float) -> None
+        """ Tell a search loop when to stop, without reading the clock at
+            every round
+        :param deadline: The time.time() value at which to stop, which is
+            shared across processes on the same host
+        """
+        self.deadline = deadline
+        self._start = time.time()
+        self._rounds = 0
+        self._countdown = 1
+
+    def expired(self):
+        # type: () -> bool
+        """ Count one finished round and tell whether the deadline passed
+            The clock is read again after as many rounds as, at the rate
+            measured so far, fill half of the remaining time (but at most
+            _DEADLINE_CHECK_INTERVAL), so that slow rounds do not overshoot
+            the deadline by more than about one round
+        """
+        self._rounds += 1
+        self._countdown -= 1
+        if self._countdown > 0:
+            return False
+        now = time.time()
+        remaining = self.deadline - now
+        if remaining <= 0:
+            return True
+        rate = self._rounds / max(now - self._start, 1e-9)
+        self._countdown = max(1, min(_DEADLINE_CHECK_INTERVAL,
+                                     int(rate * remaining / 2)))
+        return False
+
+
+# The number of rounds between two checks of the early stopping rule, and
+# the number of samples below which the variance of a child is not trusted
+_EARLY_STOP_INTERVAL = 16
+_EARLY_STOP_MIN_VISITS = 10
+
+
+def _decision_settled(visits, rewards, sq_rewards, remaining, confidence,
+                      untried=False):
+    # type: (np.ndarray, np.ndarray, np.ndarray, float, float, bool) -> bool
+    """ The early stopping rule of a root decision, from the statistics of
+        the root children; the decision is settled when
+        - the lower confidence bound of the child with the max mean reward
+          is above the upper confidence bound of every other child, or
+        - the most visited child also has the max mean reward, and no other
+          child can catch up with its visit count in the remaining rounds
+    :param remaining: The (possibly estimated) number of rounds left
+    :param confidence: The number of standard errors of the mean reward in
+        the confidence bounds
+    :param untried: Whether the root still has untried actions, in which
+        case the decision is never settled
+    """
+    if untried:
+        return False
+    if len(visits) < 2:
+        return True  # Nothing to choose from
+    means = rewards / visits
+    variances = np.maximum(sq_rewards / visits - means * means, 0.0)
+    radius = confidence * np.sqrt(variances / visits)
+    radius[visits < _EARLY_STOP_MIN_VISITS] = np.inf
+    lead = int(np.argmax(means))
+    rivals = np.arange(len(visits)) != lead
+    if means[lead] - radius[lead] > np.max(means[rivals] + radius[rivals]):
+        return True
+    most, second = np.argsort(visits)[-1:-3:-1]
+    return (means[most] == means[lead] and
+            visits[most] - visits[second] > remaining)
+
+
+# The number of visits below which a node is not trusted to extend a plan
+_PLAN_MIN_VISITS = 10
+
+
+def _extract_plan(root, children_of, search_depth=1,
+                  min_visits=_PLAN_MIN_VISITS, beam_width=1, rng=random):
+    # type: (object, callable, int, int, int, RandomStream) -> (list, list)
+    """ Follow the principal variation from root by robust child: at every
+        step, the child with the most visits (ties broken by the mean
+        reward, then randomly) extends the plan, and the extraction stops at
+        a node whose children all have fewer than min_visits visits
+        With beam_width > 1, the beam_width most visited sequences are kept
+        at every step, and the plan is the longest sequence whose last node
+        has the max mean reward
+        The cost is O(search_depth * beam_width * branching), against the
+        exponential cost of comparing every sequence
+    :param root: The node the plan starts from, in any representation
+    :param children_of: A function that takes a node and returns the list of
+        (action, child, num_samples, tot_reward) of its children
+    :return: The actions of the plan, and the confidence of each step: the
+        share of the visits of its node among its siblings
+    """
+    if min_visits < 1 or beam_width < 1:
+        raise ValueError("The visit threshold and the beam width must be "
+                         "positive")
+    # A sequence is (num_samples, mean reward, tie breaker, actions,
+    # confidences, node)
+    beam = [(0, 0.0, 0.0, [], [], root)]
+    for _ in range(search_depth):
+        candidates = []
+        for _, _, _, actions, confidences, node in beam:
+            children = children_of(node)
+            total = sum(child[2] for child in children)
+            eligible = [
+                (num_samples, tot_reward / num_samples, rng.random(),
+                 actions + [action], confidences + [num_samples / total],
+                 child)
+                for action, child, num_samples, tot_reward in children
+                if num_samples >= min_visits]
+            candidates.extend(heapq.nlargest(beam_width, eligible,
+                                             key=lambda seq: seq[:3]))
+        if not candidates:
+            break
+        beam = heapq.nlargest(beam_width, candidates, key=lambda seq: seq[:3])
+    best = max(beam, key=lambda seq: seq[1:3])
+    return best[3], best[4]
+
+
+# The criteria of the final choice of the root action
+FINAL_ACTION_CRITERIA = ('max_child', 'robust_child', 'max_robust',
+                         'secure_child')
+
+# The policies of the cyclic garbage collector during search_for_actions:
+# None leaves it alone, 'freeze' moves the objects that exist before the
+# search (the tree among them) out of its reach, and 'disable' stops it
+GC_POLICIES = (None, 'freeze', 'disable')
+
+
+class _GcScope(object):
+    def __init__(self, policy=None):
+        # type: (str) -> None
+        """ A context that applies a policy of GC_POLICIES to the cyclic
+            garbage collector, restores the previous setting on exit, and
+            measures the time spent in collections meanwhile
+            The collector is not frozen again when objects are already frozen
+            (such as by the application before forking), since unfreezing
+            would release them
+        """
+        self._policy = policy
+        self._frozen = False
+        self._disabled = False
+        self._start = None
+        self.collections = 0
+        self.elapsed = 0.0
+
+    def _callback(self, phase, info):
+        # type: (str, dict) -> None
+        if phase == 'start':
+            self._start = time.perf_counter()
+        elif self._start is not None:
+            self.elapsed += time.perf_counter() - self._start
+            self.collections += 1
+            self._start = None
+
+    def __enter__(self):
+        # type: () -> _GcScope
+        if self._policy == 'freeze' and gc.get_freeze_count() == 0:
+            gc.freeze()
+            self._frozen = True
+        elif self._policy == 'disable' and gc.isenabled():
+            gc.disable()
+            self._disabled = True
+        gc.callbacks.append(self._callback)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        gc.callbacks.remove(self._callback)
+        if self._frozen:
+            gc.unfreeze()
+        if self._disabled:
+            gc.enable()
+        return False
+
+
+# The strategies of the allocation of the samples among the root actions
+ROOT_ALLOCATIONS = ('uct', 'sequential_halving')
+
+# The statistics of the root children, as aligned arrays
+RootStatistics = namedtuple('RootStatistics',
+                            ['actions', 'visits', 'means', 'variances'])
+
+
+def _final_action_index(visits, means, criterion='robust_child',
+                        secure_const=1.0, rng=random):
+    # type: (np.ndarray, np.ndarray, str, float, RandomStream) -> int
+    """ The index of the root child chosen by a final-action criterion, from
+        the visits and mean rewards of the root children
+        - 'max_child': the max mean reward
+        - 'robust_child': the most visits, ties broken by the mean reward
+        - 'max_robust': the child with both the max mean reward and the most
+          visits; when there is none, the robust child
+        - 'secure_child': the max lower bound mean - secure_const / sqrt(n)
+        Remaining ties are broken randomly
+    """
+    if criterion == 'max_child':
+        best = np.flatnonzero(means == means.max())
+    elif criterion == 'secure_child':
+        bound = means - secure_const / np.sqrt(visits)
+        best = np.flatnonzero(bound == bound.max())
+    elif criterion in ('robust_child', 'max_robust'):
+        best = np.flatnonzero(visits == visits.max())
+        if criterion == 'max_robust':
+            both = np.intersect1d(best, np.flatnonzero(means == means.max()))
+            if len(both):
+                best = both
+        best = best[means[best] == means[best].max()]
+    else:
+        raise ValueError("Unknown final action criterion {0}".format(
+            criterion))
+    return int(best[rng.randrange(len(best))])
+
+
+class ArrayTree(object):
+    def __init__(self, state, capacity=1024, rng=random):
+        # type: (AbstractState, int, RandomStream) -> None
+        """ Create a search tree whose statistics are kept in contiguous NumPy
+            arrays (struct of arrays) instead of Node objects
+            Node i has visit count visits[i], total reward rewards[i], sum
+            of squared rewards sq_rewards[i] and parent parents[i] (-1 for
+            the root); the children of a node occupy
+            the slots child_start[i] to child_start[i] + child_count[i], and
+            the slot block of a node is reserved at its first expansion
+        :param state: The state at the root
+        :param capacity: The initial number of slots; the arrays grow
+            geometrically when the slots run out
+        :param rng: The generator of the tree policy and the default
+            rollout policy
+        """
+        if capacity <= 0:
+            raise ValueError("The capacity must be positive")
+        self._rng = rng
+        self._allocate(capacity)
+        self.root = self._reserve(1)
+        self._init_slot(self.root, state, -1, None)
+
+    def _allocate(self, capacity):
+        # type: (int) -> None
+        """ Allocate empty arrays with the given number of slots
+        """
+        self._size = 0
+        self.visits = np.zeros(capacity, dtype=np.int64)
+        self.rewards = np.zeros(capacity, dtype=np.float64)
+        self.sq_rewards = np.zeros(capacity, dtype=np.float64)
+        self.parents = np.full(capacity, -1, dtype=np.int64)
+        self.child_start = np.full(capacity, -1, dtype=np.int64)
+        self.child_count = np.zeros(capacity, dtype=np.int64)
+        self.states = []  # [AbstractState]
+        self.actions = []  # [AbstractAction], the action leading to a node
+        self.untried = []  # [list], the untried actions of a node
+
+    @property
+    def size(self):
+        # type: () -> int
+        """ The number of reserved slots
+        """
+        return self._size
+
+    @property
+    def capacity(self):
+        # type: () -> int
+        return self.visits.shape[0]
+
+    def _grow(self, min_capacity):
+        # type: (int) -> None
+        """ Enlarge all arrays geometrically to hold at least min_capacity
+            slots
+        """
+        capacity = self.capacity
+        while capacity < min_capacity:
+            capacity *= 2
+        for name, fill in (('visits', 0), ('rewards', 0.0),
+                           ('sq_rewards', 0.0), ('parents', -1),
+                           ('child_start', -1), ('child_count', 0)):
+            old = getattr(self, name)
+            new = np.full(capacity, fill, dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, name, new)
+
+    def _reserve(self, num_slots):
+        # type: (int) -> int
+        """ Reserve num_slots contiguous slots and return the first index
+        """
+        start = self._size
+        if start + num_slots > self.capacity:
+            self._grow(start + num_slots)
+        self._size += num_slots
+        self.states.extend([None] * num_slots)
+        self.actions.extend([None] * num_slots)
+        self.untried.extend([None] * num_slots)
+        return start
+
+    def _init_slot(self, index, state, parent, action):
+        # type: (int, AbstractState, int, AbstractAction) -> None
+        self.states[index] = state
+        self.actions[index] = action
+        self.untried[index] = state.possible_actions
+        self.parents[index] = parent
+
+    def is_expanded(self, index):
+        # type: (int) -> bool
+        """ Whether all possible actions of a node have been tried
+        """
+        return len(self.untried[index]) == 0
+
+    def children(self, index):
+        # type: (int) -> range
+        """ The slot indices of the expanded children of a node
+        """
+        start = self.child_start[index]
+        if start < 0:
+            return range(0)
+        return range(start, start + self.child_count[index])
+
+    def child_by_action(self, index, action):
+        # type: (int, AbstractAction) -> int
+        """ The slot index of the child reached by action, or -1 if the child
+            has not been expanded
+        """
+        for child in self.children(index):
+            if self.actions[child] == action:
+                return child
+        return -1
+
+    def add_child(self, index, action):
+        # type: (int, AbstractAction) -> int
+        """ Expand a node with the given action and return the child slot
+        """
+        untried = self.untried[index]
+        if self.child_start[index] < 0:
+            self.child_start[index] = self._reserve(len(untried))
+        child = self.child_start[index] + self.child_count[index]
+        self.child_count[index] += 1
+        untried.remove(action)
+        self._init_slot(child, self.states[index].execute_action(action),
+                        index, action)
+        return child
+
+    def select(self, index, exploration_const=1.0):
+        # type: (int, float) -> int
+        """ Select the best child by UCB over the whole child slice in one
+            vectorized call; ties are broken randomly
+        """
+        start = self.child_start[index]
+        stop = start + self.child_count[index]
+        visits = self.visits[start:stop]
+        ucb = (self.rewards[start:stop] / visits + exploration_const *
+               np.sqrt(2.0 * math.log(self.visits[index]) / visits))
+        best = np.flatnonzero(ucb == ucb.max())
+        return start + int(best[self._rng.randrange(len(best))])
+
+    def expand(self, index):
+        # type: (int) -> int
+        """ Randomly select an untried action of a node and expand it
+        """
+        if self.is_expanded(index):
+            raise Exception("Should not expand a node that has already"
+                            " been expanded")
+        return self.add_child(index, self._rng.choice(self.untried[index]))
+
+    def backpropagate(self, index, reward=0.0):
+        # type: (int, float) -> None
+        """ Walk the parent indices from a node up to the root and update
+            the statistics of the whole path at once
+        """
+        path = []
+        while index >= 0:
+            path.append(index)
+            index = self.parents[index]
+        self.visits[path] += 1
+        self.rewards[path] += reward
+        self.sq_rewards[path] += _squared(reward)
+
+    def execute_round(self, max_tree_depth=15, rollout_policy=None,
+                      exploration_const=1.0):
+        # type: (int, callable, float) -> None
+        """ Perform selection, expansion, simulation and backpropagation with
+            one sample from the root
+        """
+        cur = self.root
+        depth = 1
+        while self.is_expanded(cur) and depth < max_tree_depth:
+            if self.child_count[cur] == 0:
+                break
+            cur = self.select(cur, exploration_const)
+            depth += 1
+        if depth < max_tree_depth and not self.is_expanded(cur):
+            cur = self.expand(cur)
+        if rollout_policy is None:
+            rollout_policy = _bind_rng(random_rollout_policy, self._rng)
+        reward = rollout_policy(self.states[cur])
+        self.backpropagate(cur, reward)
+
+    def reroot(self, action):
+        # type: (AbstractAction) -> ArrayTree
+        """ Make the child reached by action the new root and compact the
+            arrays so that only the subtree of the new root is kept
+            As with Node.add_child, an action that is neither a child nor
+            untried still gives a new root, built from the state of the
+            root, with nothing else kept
+        """
+        new_root = self.child_by_action(self.root, action)
+        if new_root < 0:
+            if action not in self.untried[self.root]:
+                state = self.states[self.root].execute_action(action)
+                self._allocate(max(self.capacity // 2, 1))
+                self.root = self._reserve(1)
+                self._init_slot(self.root, state, -1, None)
+                return self
+            new_root = self.add_child(self.root, action)
+        self._compact(new_root)
+        return self
+
+    def _compact(self, new_root):
+        # type: (int) -> None
+        """ Copy the subtree under new_root into fresh arrays so that the
+            slots of pruned siblings and ancestors are released; the child
+            blocks stay contiguous
+        """
+        visits, rewards, sq_rewards = (self.visits, self.rewards,
+                                       self.sq_rewards)
+        child_start, child_count = self.child_start, self.child_count
+        states, actions, untried = self.states, self.actions, self.untried
+        self._allocate(max(self.capacity // 2, 1))
+        self.root = self._reserve(1)
+        self.states[self.root] = states[new_root]
+        self.untried[self.root] = untried[new_root]
+        stack = [(new_root, self.root)]
+        while stack:
+            old_index, index = stack.pop()
+            self.visits[index] = visits[old_index]
+            self.rewards[index] = rewards[old_index]
+            self.sq_rewards[index] = sq_rewards[old_index]
+            if child_start[old_index] < 0:
+                continue
+            start = self._reserve(len(untried[old_index]) +
+                                  child_count[old_index])
+            self.child_start[index] = start
+            self.child_count[index] = child_count[old_index]
+            for k in range(child_count[old_index]):
+                old_child = child_start[old_index] + k
+                self.states[start + k] = states[old_child]
+                self.actions[start + k] = actions[old_child]
+                self.untried[start + k] = untried[old_child]
+                self.parents[start + k] = index
+                stack.append((old_child, start + k))
+
+
+# Node statistics and children are guarded by striped locks, so that
+# threads never rely on the GIL for the read-modify-write of a counter and
+# Node objects do not each carry a lock
+_NODE_LOCKS = tuple(threading.Lock() for _ in range(256))
+
+
+def _node_lock(node):
+    # type: (Node) -> threading.Lock
+    return _NODE_LOCKS[(id(node) >> 4) % len(_NODE_LOCKS)]
+
+
+def _virtual_loss_descent(root, max_tree_depth, virtual_loss=1.0,
+                          rng=random):
+    # type: (Node, int, float, RandomStream) -> list
+    """ Descend from root with the built-in tree policy and return the path
+        to the node to simulate from (the last element)
+        Every node on the descent is given a virtual loss (one visit whose
+        reward is -virtual_loss) as soon as it is entered, so that concurrent
+        descents are steered to different paths
+        At most one node lock is held at a time, and the new child state is
+        computed outside of any lock, so several threads may descend the
+        same tree at once, each with its own rng
+    """
+    path = []
+    cur = root
+    depth = 1
+    action = None
+    while True:
+        nxt = None
+        with _node_lock(cur):
+            cur.num_samples += 1
+            cur.tot_reward -= virtual_loss
+            path.append(cur)
+            if cur._untried_edges:
+                if depth < max_tree_depth:
+                    action = rng.choice(cur._untried_edges)
+                    cur._untried_edges.remove(action)
+            elif depth < max_tree_depth and cur.children:
+                log_n = 2.0 * math.log(cur.num_samples)
+                max_val = -float('inf')
+                for child in cur.children.values():
+                    node_val = (child.tot_reward / child.num_samples +
+                                math.sqrt(log_n / child.num_samples))
+                    if node_val > max_val:
+                        max_val = node_val
+                        nxt = child
+        if nxt is None:
+            break
+        cur = nxt
+        depth += 1
+    if action is not None:
+        child = cur.new_child_node(action, cur.state.execute_action(action))
+        child.num_samples = 1
+        child.tot_reward = -virtual_loss
+        with _node_lock(cur):
+            cur.children[action] = child
+        path.append(child)
+    return path
+
+
+def _virtual_loss_backup(path, reward, virtual_loss=1.0):
+    # type: (list, float, float) -> None
+    """ Replace the virtual loss on a path by the simulation reward
+    """
+    sq_reward = _squared(reward)
+    for node in path:
+        with _node_lock(node):
+            node.tot_reward += reward + virtual_loss
+            node.tot_sq_reward += sq_reward
+
+
+def _tree_parallel_round(root, max_tree_depth, rollout_policy,
+                         virtual_loss=1.0, rng=random):
+    # type: (Node, int, callable, float, RandomStream) -> None
+    """ One round of the built-in policies that may run in several threads
+        on the same tree at once
+    """
+    path = _virtual_loss_descent(root, max_tree_depth, virtual_loss, rng)
+    _virtual_loss_backup(path, rollout_policy(path[-1].state), virtual_loss)
+
+
+def _batched_round(root, max_tree_depth, batch_rollout_policy, batch_size,
+                   virtual_loss=1.0, rng=random):
+    # type: (Node, int, callable, int, float, RandomStream) -> None
+    """ Select batch_size leaves (made different by virtual loss), evaluate
+        all of their states in one call of batch_rollout_policy, and then
+        back-propagate the results together
+    """
+    paths = [_virtual_loss_descent(root, max_tree_depth, virtual_loss, rng)
+             for _ in range(batch_size)]
+    rewards = batch_rollout_policy([path[-1].state for path in paths])
+    for path, reward in zip(paths, rewards):
+        _virtual_loss_backup(path, reward, virtual_loss)
+
+
+def tree_parallel_speedup(initial_state, samples=1000, threads=4,
+                          **tree_kwargs):
+    # type: (AbstractState, int, int, dict) -> (float, float, float)
+    """ Time the same number of samples with the single-threaded
+        execute_round loop and with the tree-parallel mode, each on a fresh
+        tree from initial_state
+    :param tree_kwargs: Other arguments of MonteCarloSearchTree
+    :return: The serial time, the tree-parallel time and the speedup
+    """
+    serial = MonteCarloSearchTree(initial_state, samples=samples,
+                                  **tree_kwargs)
+    serial.search_for_actions()
+    parallel = MonteCarloSearchTree(initial_state, samples=samples,
+                                    threads=threads, **tree_kwargs)
+    parallel.search_for_actions()
+    serial_time = serial.search_info['elapsed']
+    parallel_time = parallel.search_info['elapsed']
+    return serial_time, parallel_time, serial_time / parallel_time
+
+
+def _merge_child_statistics(statistics):
+    # type: (list) -> dict
+    """ Merge lists of (action, num_samples, tot_reward) into
+        {AbstractAction: [num_samples, tot_reward]}
+    """
+    merged = {}
+    for stats in statistics:
+        for action, num_samples, tot_reward in stats:
+            entry = merged.setdefault(action, [0, 0.0])
+            entry[0] += num_samples
+            entry[1] += tot_reward
+    return merged
+
+
+def _best_merged_action(merged, rng=random):
+    # type: (dict, RandomStream) -> AbstractAction
+    """ The action with the max mean reward in merged child statistics;
+        ties are broken randomly
+    """
+    max_val = -float('inf')
+    max_actions = []
+    for action, (num_samples, tot_reward) in merged.items():
+        node_val = tot_reward / num_samples
+        if node_val > max_val:
+            max_val = node_val
+            max_actions = [action]
+        elif node_val == max_val:
+            max_actions.append(action)
+    return rng.choice(max_actions)
+
+
+def _root_parallel_worker(connection, initial_state, tree_kwargs):
+    # type: (multiprocessing.connection.Connection, AbstractState, dict) -> None
+    """ The loop run by each process of a root-parallel search; the process
+        keeps its own tree between commands so that the subtree under the
+        new root is reused after update_root
+    """
+    tree = MonteCarloSearchTree(initial_state, **tree_kwargs)
+    while True:
+        command, arg = connection.recv()
+        if command == 'search':
+            samples, seed, deadline = arg
+            tree.rng.seed(seed)
+            connection.send(tree._run_samples(samples, deadline))
+        elif command == 'children':
+            connection.send(tree._child_statistics(arg))
+        elif command == 'update_root':
+            tree.update_root(arg)
+        else:
+            break
+    connection.close()
+
+
+class _RootParallelPool(object):
+    def __init__(self, num_workers, initial_state, tree_kwargs):
+        # type: (int, AbstractState, dict) -> None
+        """ Start num_workers long-lived processes, each of which grows an
+            independent tree from initial_state
+        """
+        self._connections = []
+        self._processes = []
+        for _ in range(num_workers):
+            connection, worker_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_root_parallel_worker, daemon=True,
+                args=(worker_connection, initial_state, tree_kwargs))
+            process.start()
+            worker_connection.close()
+            self._connections.append(connection)
+            self._processes.append(process)
+
+    @property
+    def num_workers(self):
+        # type: () -> int
+        return len(self._connections)
+
+    def search(self, samples, seed, deadline=None):
+        # type: (int, int, float) -> int
+        """ Split samples among the workers and wait until all of them are
+            done; worker i is seeded with seed + i
+        :param deadline: When not None, the time.time() value at which the
+            workers stop early
+        :return: The number of rounds run by all workers
+        """
+        share, remainder = divmod(samples, self.num_workers)
+        for i, connection in enumerate(self._connections):
+            connection.send(('search', (share + (i < remainder), seed + i,
+                                        deadline)))
+        return sum(connection.recv() for connection in self._connections)
+
+    def child_statistics(self, path):
+        # type: (list) -> dict
+        """ Merge the statistics of the children of the node reached from
+            the root by path over all workers
+        :return: {AbstractAction: [num_samples, tot_reward]}
+        """
+        for connection in self._connections:
+            connection.send(('children', path))
+        return _merge_child_statistics(
+            [connection.recv() for connection in self._connections])
+
+    def update_root(self, action):
+        # type: (AbstractAction) -> None
+        for connection in self._connections:
+            connection.send(('update_root', action))
+
+    def close(self):
+        # type: () -> None
+        for connection in self._connections:
+            connection.send(('close', None))
+            connection.close()
+        for process in self._processes:
+            process.join()
+        self._connections = []
+        self._processes = []
+
+
+class SharedArrayTree(object):
+    # The header slots and the per-node arrays of the shared segment
+    _SIZE, _ROOT, _REMAINING = range(3)
+    _HEADER_LENGTH = 4
+    _FIELDS = (('visits', np.int64, 0), ('rewards', np.float64, 0.0),
+               ('parents', np.int64, -1), ('child_start', np.int64, -1),
+               ('child_count', np.int64, 0), ('expanded', np.int64, 0))
+
+    def __init__(self, capacity, name=None, locks=None):
+        # type: (int, str, tuple) -> None
+        """ A search tree with a fixed number of slots whose statistics live
+            in a multiprocessing.shared_memory segment as flat arrays, so
+            that several processes can search it at once
+            The layout is that of ArrayTree, except that the children of a
+            node occupy one slot per possible action, and child k of a node
+            is reached by the k-th action of its possible_actions; the
+            children are expanded in that order, and expanded[i] is the
+            number of expanded children of node i
+            The node statistics are guarded by striped locks (node i uses
+            locks[i % len(locks)]); the last lock guards the allocation of
+            slots and the sample counter
+        :param capacity: The number of slots
+        :param name: The name of an existing segment to attach to; when
+            None, a new segment is created with an empty root
+        :param locks: The locks shared with the processes that attach to
+            the segment; required when attaching
+        """
+        if capacity <= 0:
+            raise ValueError("The capacity must be positive")
+        self._capacity = capacity
+        self._owner = name is None
+        size = 8 * (self._HEADER_LENGTH + len(self._FIELDS) * capacity)
+        self._shm = shared_memory.SharedMemory(name=name, create=self._owner,
+                                               size=size)
+        self.header = np.ndarray(self._HEADER_LENGTH, dtype=np.int64,
+                                 buffer=self._shm.buf)
+        offset = 8 * self._HEADER_LENGTH
+        for field, dtype, _ in self._FIELDS:
+            setattr(self, field, np.ndarray(capacity, dtype=dtype,
+                                            buffer=self._shm.buf,
+                                            offset=offset))
+            offset += 8 * capacity
+        if locks is None:
+            locks = tuple(multiprocessing.Lock() for _ in range(65))
+        self.locks = locks
+        if self._owner:
+            self.reset()
+
+    @property
+    def name(self):
+        # type: () -> str
+        return self._shm.name
+
+    @property
+    def capacity(self):
+        # type: () -> int
+        return self._capacity
+
+    @property
+    def root(self):
+        # type: () -> int
+        return int(self.header[self._ROOT])
+
+    @property
+    def size(self):
+        # type: () -> int
+        return int(self.header[self._SIZE])
+
+    def lock(self, index):
+        # type: (int) -> multiprocessing.Lock
+        return self.locks[index % (len(self.locks) - 1)]
+
+    @property
+    def allocation_lock(self):
+        # type: () -> multiprocessing.Lock
+        return self.locks[-1]
+
+    def reset(self):
+        # type: () -> None
+        """ Discard all nodes but an empty root
+        """
+        self.header[:] = 0
+        self.header[self._SIZE] = 1
+        self._clear(0, 1)
+
+    def _clear(self, start, stop):
+        # type: (int, int) -> None
+        for field, _, fill in self._FIELDS:
+            getattr(self, field)[start:stop] = fill
+
+    def reserve(self, num_slots):
+        # type: (int) -> int
+        """ Reserve num_slots contiguous empty slots
+        :return: The first index, or -1 if the segment is full
+        """
+        with self.allocation_lock:
+            start = int(self.header[self._SIZE])
+            if start + num_slots > self._capacity:
+                return -1
+            self.header[self._SIZE] = start + num_slots
+        self._clear(start, start + num_slots)
+        return start
+
+    def take_sample(self):
+        # type: () -> bool
+        """ Decrement the shared sample counter
+        :return: Whether a sample was left to take
+        """
+        with self.allocation_lock:
+            if self.header[self._REMAINING] <= 0:
+                return False
+            self.header[self._REMAINING] -= 1
+            return True
+
+    def set_samples(self, samples):
+        # type: (int) -> None
+        self.header[self._REMAINING] = samples
+
+    def child_slice(self, index):
+        # type: (int) -> range
+        """ The slots of the expanded children of a node
+        """
+        start = int(self.child_start[index])
+        if start < 0:
+            return range(0)
+        return range(start, start + int(self.expanded[index]))
+
+    def reroot(self, child):
+        # type: (int) -> None
+        """ Make child the root and compact its subtree to the front of the
+            segment; must only be called while no process is searching
+        """
+        fields = [getattr(self, field)[:self.size].copy()
+                  for field, _, _ in self._FIELDS]
+        visits, rewards, _, child_start, child_count, expanded = fields
+        self.reset()
+        self.visits[0], self.rewards[0] = visits[child], rewards[child]
+        stack = [(child, 0)]
+        while stack:
+            old_index, index = stack.pop()
+            if child_start[old_index] < 0:
+                continue
+            start = self.reserve(int(child_count[old_index]))
+            self.child_start[index] = start
+            self.child_count[index] = child_count[old_index]
+            self.expanded[index] = expanded[old_index]
+            for k in range(int(expanded[old_index])):
+                old_child = child_start[old_index] + k
+                self.visits[start + k] = visits[old_child]
+                self.rewards[start + k] = rewards[old_child]
+                self.parents[start + k] = index
+                stack.append((old_child, start + k))
+
+    def close(self):
+        # type: () -> None
+        """ Detach from the segment, and free it if this object created it
+        """
+        for field, _, _ in self._FIELDS:
+            setattr(self, field, None)
+        self.header = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+
+def _shared_tree_round(tree, root_state, cache, max_tree_depth,
+                       rollout_policy, virtual_loss=1.0, rng=random):
+    # type: (SharedArrayTree, AbstractState, dict, int, callable, float, RandomStream) -> None
+    """ One round of selection, expansion, simulation and backpropagation on
+        a shared tree, with virtual loss on the descent
+        The states are re-derived in this process by executing the actions
+        from root_state; cache maps node indices to (state, actions) pairs
+        already derived by this process
+    """
+    visits, rewards = tree.visits, tree.rewards
+    index = tree.root
+    state = root_state
+    path = []
+    depth = 1
+    while True:
+        with tree.lock(index):
+            visits[index] += 1
+            rewards[index] -= virtual_loss
+        path.append(index)
+        if depth >= max_tree_depth or state.is_terminal:
+            break
+        if index in cache:
+            actions = cache[index][1]
+        else:
+            actions = state.possible_actions
+            cache[index] = (state, actions)
+        if not actions:
+            break
+        child = -1
+        with tree.lock(index):
+            if tree.child_start[index] < 0:
+                tree.child_start[index] = tree.reserve(len(actions))
+                tree.child_count[index] = len(actions)
+            start = tree.child_start[index]
+            k = tree.expanded[index]
+            if start >= 0 and k < len(actions):
+                child = start + k
+                visits[child] = 1
+                rewards[child] = -virtual_loss
+                tree.parents[child] = index
+                tree.expanded[index] = k + 1
+        if child >= 0:
+            state = state.execute_action(actions[k])
+            path.append(child)
+            break
+        if start < 0:  # The segment is full
+            break
+        stop = start + tree.expanded[index]
+        ucb = (rewards[start:stop] / visits[start:stop] +
+               np.sqrt(2.0 * math.log(visits[index]) / visits[start:stop]))
+        best = np.flatnonzero(ucb == ucb.max())
+        k = int(best[rng.randrange(len(best))])
+        index = start + k
+        state = (cache[index][0] if index in cache else
+                 state.execute_action(actions[k]))
+        depth += 1
+    reward = rollout_policy(state)
+    for index in path:
+        with tree.lock(index):
+            rewards[index] += reward + virtual_loss
+
+
+def _shared_tree_worker(connection, name, capacity, locks, initial_state,
+                        max_tree_depth, rollout_policy, virtual_loss,
+                        max_cached_states):
+    # type: (multiprocessing.connection.Connection, str, int, tuple, AbstractState, int, callable, float, int) -> None
+    """ The loop run by each process of a shared-tree search
+    """
+    tree = SharedArrayTree(capacity, name=name, locks=locks)
+    root_state = initial_state
+    cache = {}
+    rng = RandomStream()
+    rollout_policy = _bind_rng(rollout_policy, rng)
+    while True:
+        command, arg = connection.recv()
+        if command == 'search':
+            seed, deadline = arg
+            rng.seed(seed)
+            rounds = 0
+            timer = _Deadline(deadline) if deadline is not None else None
+            while tree.take_sample():
+                if len(cache) > max_cached_states:
+                    cache.clear()
+                _shared_tree_round(tree, root_state, cache, max_tree_depth,
+                                   rollout_policy, virtual_loss, rng)
+                rounds += 1
+                if timer is not None and timer.expired():
+                    break
+            connection.send(rounds)
+        elif command == 'update_root':
+            root_state = arg
+            cache.clear()
+        else:
+            break
+    tree.close()
+    connection.close()
+
+
+class _SharedTreePool(object):
+    def __init__(self, num_workers, initial_state, capacity, max_tree_depth,
+                 rollout_policy, virtual_loss=1.0, max_cached_states=100000):
+        # type: (int, AbstractState, int, int, callable, float, int) -> None
+        """ Create a shared tree and start num_workers long-lived processes
+            that search it together
+        """
+        self._tree = SharedArrayTree(capacity)
+        self._root_state = initial_state
+        self._connections = []
+        self._processes = []
+        for _ in range(num_workers):
+            connection, worker_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_shared_tree_worker, daemon=True,
+                args=(worker_connection, self._tree.name, capacity,
+                      self._tree.locks, initial_state, max_tree_depth,
+                      rollout_policy, virtual_loss, max_cached_states))
+            process.start()
+            worker_connection.close()
+            self._connections.append(connection)
+            self._processes.append(process)
+
+    @property
+    def num_workers(self):
+        # type: () -> int
+        return len(self._connections)
+
+    def search(self, samples, seed, deadline=None):
+        # type: (int, int, float) -> int
+        """ Let the workers share samples rounds on the tree and wait until
+            they are done; worker i is seeded with seed + i
+        :param deadline: When not None, the time.time() value at which the
+            workers stop early
+        :return: The number of rounds run by all workers
+        """
+        self._tree.set_samples(min(samples, np.iinfo(np.int64).max))
+        for i, connection in enumerate(self._connections):
+            connection.send(('search', (seed + i, deadline)))
+        return sum(connection.recv() for connection in self._connections)
+
+    def child_statistics(self, path):
+        # type: (list) -> dict
+        """ The statistics of the children of the node reached from the root
+            by path, in the same format as _RootParallelPool
+        """
+        tree = self._tree
+        index = tree.root
+        state = self._root_state
+        for action in path:
+            k = state.possible_actions.index(action)
+            if k >= len(tree.child_slice(index)):
+                return {}
+            index = tree.child_start[index] + k
+            state = state.execute_action(action)
+        actions = state.possible_actions
+        return {actions[child - tree.child_start[index]]:
+                [int(tree.visits[child]), float(tree.rewards[child])]
+                for child in tree.child_slice(index)}
+
+    def update_root(self, action):
+        # type: (AbstractAction) -> None
+        tree = self._tree
+        k = self._root_state.possible_actions.index(action)
+        if k < len(tree.child_slice(tree.root)):
+            tree.reroot(int(tree.child_start[tree.root]) + k)
+        else:
+            tree.reset()
+        self._root_state = self._root_state.execute_action(action)
+        for connection in self._connections:
+            connection.send(('update_root', self._root_state))
+
+    def close(self):
+        # type: () -> None
+        for connection in self._connections:
+            connection.send(('close', None))
+            connection.close()
+        for process in self._processes:
+            process.join()
+        self._connections = []
+        self._processes = []
+        self._tree.close()
+
+
+# The options of MonteCarloSearchTree that rule out other options, as
+# (option, incompatible options, error message); the options are named in
+# MonteCarloSearchTree.__init__
+_INCOMPATIBLE_OPTIONS = (
+    ('tree_parallel', ('workers', 'not_node', 'custom_policies'),
+     "The tree-parallel and batched modes only support the built-in "
+     "policies on the node backend"),
+    ('transpositions', ('tree_parallel', 'not_node', 'custom_policies'),
+     "The transposition table only supports the built-in policies on the "
+     "node backend"),
+    ('threads', ('batch',),
+     "The tree-parallel and batched modes cannot be combined"),
+    ('node_budget', ('tree_parallel', 'not_node', 'transpositions'),
+     "A node budget is only supported by the serial node backend without a "
+     "transposition table"),
+    ('ponder', ('workers', 'threads', 'shared'),
+     "Pondering only supports the in-process node and array backends "
+     "without threads"),
+    ('early_stopping', ('workers', 'threads', 'shared'),
+     "Early stopping only supports the in-process node and array backends "
+     "without threads"),
+    ('widening', ('tree_parallel', 'not_node', 'custom_policies'),
+     "Progressive widening only supports the built-in policies on the "
+     "serial node backend"),
+    ('rollout_cache', ('workers', 'shared', 'batch_rollout_policy'),
+     "The rollout cache only supports the in-process backends without a "
+     "batch rollout policy"),
+    ('open_loop', ('tree_parallel', 'not_node', 'transpositions', 'widening',
+                   'custom_policies'),
+     "The open-loop mode only supports the built-in policies on the serial "
+     "node backend"),
+    ('priors', ('tree_parallel', 'not_node', 'transpositions', 'widening',
+                'open_loop', 'custom_policies'),
+     "PUCT selection only supports the built-in policies on the serial node "
+     "backend"),
+    ('rave', ('tree_parallel', 'not_node', 'transpositions', 'widening',
+              'open_loop', 'priors', 'rollout_cache', 'custom_policies'),
+     "RAVE selection only supports the built-in policies on the serial node "
+     "backend without a rollout cache"),
+    ('sequential_halving', ('workers', 'tree_parallel', 'not_node',
+                            'transpositions', 'open_loop', 'early_stopping',
+                            'time_budget', 'widening', 'ponder',
+                            'custom_policies'),
+     "Sequential halving only supports the built-in policies on the serial "
+     "node backend with a number of samples, without progressive widening "
+     "or pondering"),
+    ('not_node', ('custom_policies',),
+     "The array and shared backends only support the built-in tree and "
+     "backpropagation policies"))
 
 
 class MonteCarloSearchTree:
     def __init__(self, initial_state, samples=1000, max_tree_depth=10,
                  tree_select_policy=select, tree_expand_policy=expand,
                  rollout_policy=random_rollout_policy,
-                 backpropagate_method=backpropagate):
-        # type: (AbstractState, int, int, callable, callable, callable, callable) -> None
+                 backpropagate_method=backpropagate, tree_backend='node',
+                 workers=1, threads=1, virtual_loss=1.0, batch_size=1,
+                 batch_rollout_policy=None, shared_capacity=1 << 20,
+                 transposition_table=None, release_pruned=True,
+                 max_nodes=None, max_tree_bytes=None, time_budget=None,
+                 ponder=False, early_stopping=None, progressive_widening=None,
+                 action_priority=None, rollout_cache=None, open_loop=False,
+                 open_loop_cache_visits=None, open_loop_cache_states=1024,
+                 random_seed=None,
+                 final_action='robust_child', secure_const=1.0,
+                 prior_policy=None, puct_const=1.0, rave_equivalence=None,
+                 root_allocation='uct', halving_actions=16,
+                 rollout_horizon=None, value_estimator=None,
+                 gc_policy='freeze'):
+        # type: (AbstractState, int, int, callable, callable, callable, callable, str, int, int, float, int, callable, int, int, bool, int, int, float, bool, float, (float, float), callable, RolloutCache, bool, int, int, int, str, float, callable, float, float, str, int, int, callable, str) -> None
         """ Create a MonteCarloSearchTree object
         :param initial_state: The initial state
         :param samples: The number of samples to generate to obtain the best
@@ -222,75 +2403,1213 @@ class MonteCarloSearchTree:
         :type backpropagate_method: The function that takes a Node (where
             the simulation starts) as input, performs simulation and returns
             the final reward
+        :param tree_backend: 'node' keeps the tree as linked Node objects;
+            'array' keeps the statistics in contiguous NumPy arrays (see
+            ArrayTree); 'shared' keeps them in a shared memory segment (see
+            SharedArrayTree) searched by the given number of worker
+            processes at once with virtual loss; 'array' and 'shared' only
+            support the built-in select, expand and backpropagate methods
+        :param workers: The number of processes of the 'shared' backend
+            Otherwise, when greater than 1, the search is root-parallel:
+            each of the given number of processes grows an independent tree
+            from the same root with a different seed, the samples are split
+            among them, and the actions are chosen from the merged root child
+            statistics; the processes live until close() is called
+            Actions must be picklable and comparable across processes
+        :param threads: When greater than 1, the search is tree-parallel:
+            the given number of threads descend the same Node tree at once,
+            which pays off when the rollout policy releases the GIL (or on a
+            free-threaded build); only the built-in tree and
+            backpropagation policies are supported
+        :param virtual_loss: The reward subtracted (with one extra visit)
+            from every node being explored in tree-parallel or batched mode
+        :param batch_size: When greater than 1, each step selects this
+            number of leaves (made different by virtual loss) and evaluates
+            them together; only the built-in tree and backpropagation
+            policies are supported
+        :param batch_rollout_policy: The batch evaluation function
+        :type batch_rollout_policy: A function that takes a list of states
+            and returns the list of their rewards; when None, rollout_policy
+            is applied to each state
+        :param shared_capacity: The number of node slots of the 'shared'
+            backend; when the slots run out, the leaves are no longer
+            expanded until update_root compacts the tree
+        :param transposition_table: When not None, the maximal number of
+            entries of a TranspositionTable that shares the nodes of states
+            with the same state_key(); the states must implement state_key,
+            and only the built-in policies on the node backend (possibly
+            root-parallel) are supported
+        :param release_pruned: Whether update_root frees the old root and
+            the pruned sibling subtrees at once (see Node.release)
+        :param max_nodes: When not None, the node budget of the tree; when
+            it is exceeded, the least-visited leaves are evicted until the
+            tree is back to 90% of the budget (see _evict)
+        :param max_tree_bytes: When not None, a node budget given as an
+            estimate of the memory of the nodes and their states
+            max_nodes and max_tree_bytes are only supported by the serial
+            (possibly root-parallel) node backend without a transposition
+            table
+        :param time_budget: When not None, the default number of seconds
+            of a search (see search_for_actions), in place of samples
+        :param ponder: Whether a background thread keeps running rounds on
+            the current root between the calls of search_for_actions, which
+            then only tops up the samples or the time budget; the thread is
+            paused while the tree is searched or re-rooted and stopped by
+            close(); only the in-process node and array backends without
+            tree-parallel threads are supported, and max_nodes is advised
+            to bound the tree grown while idle
+        :param early_stopping: When not None, the search stops as soon as
+            the root decision is settled (see _decision_settled), with
+            confidence bounds of this number of standard errors (such as
+            2.0); the samples saved are in search_info; only the in-process
+            node and array backends without threads are supported
+        :param progressive_widening: When not None, a (k, alpha) pair: a
+            node visited N times may only have k * N ** alpha children (and
+            at least one), so that the search goes deeper on states with
+            many actions; only the serial (possibly root-parallel) node
+            backend with the built-in policies is supported
+        :param action_priority: With progressive_widening, the order in
+            which the actions of a node are tried (see _LazyUntriedActions)
+        :type action_priority: A cheap function that takes a state and one
+            of its actions and returns the priority of the action, such as
+            KolumboState.action_priority; when None, the order is random
+        :param rollout_cache: When not None, a RolloutCache through which
+            the rollout policy is called, so that the rollouts of states
+            with the same state_key() are reused; only the in-process
+            backends with the rollout policy (not a batch rollout policy)
+            are supported
+        :param open_loop: Whether the nodes keep only their statistics and
+            children (see OpenLoopNode), the states being replayed from
+            the root state at every descent, which trades time for a much
+            smaller tree; only the serial (possibly root-parallel) node
+            backend with the built-in policies is supported, without a
+            transposition table or progressive widening
+        :param open_loop_cache_visits: In open-loop mode, when not None,
+            the number of visits from which a node keeps its state
+        :param open_loop_cache_states: The maximal number of states kept
+            with open_loop_cache_visits; beyond it, the state of the least
+            recently used node is dropped
+        :param random_seed: The seed of the RandomStream owned by the tree,
+            which draws the random numbers of the built-in policies
+            (including random_rollout_policy) instead of the global random
+            module; when None, the stream is seeded from the operating
+            system
+        :param final_action: The criterion of the choice of the root action
+            among FINAL_ACTION_CRITERIA (see _final_action_index):
+            'max_child', 'robust_child', 'max_robust' or 'secure_child'
+        :param secure_const: The constant of the lower bound of
+            'secure_child', in units of reward
+        :param prior_policy: When not None, the selection and expansion use
+            PUCT (see _puct_round) with the priors of this policy, computed
+            once per node in one call (see _PriorUntriedActions); only the
+            serial (possibly root-parallel) node backend with the built-in
+            policies is supported, without a transposition table,
+            progressive widening or the open-loop mode
+        :type prior_policy: A function that takes a state and the list of
+            its possible actions and returns their probabilities, such as
+            SoftmaxPriors or KolumboHeuristicsGenerator.get_prior_policy
+        :param puct_const: The exploration constant of PUCT, in units of
+            reward
+        :param rave_equivalence: When not None, the selection uses RAVE (see
+            _rave_round) with this number of samples at which a child's own
+            mean and the AMAF mean of its action weigh roughly the same;
+            the rollout policy must then return the reward and the list of
+            the actions it took (random_rollout_policy is replaced with
+            random_trace_rollout_policy), and the same restrictions as for
+            prior_policy, without a rollout cache
+        :param root_allocation: The allocation of the samples among the root
+            actions, among ROOT_ALLOCATIONS: 'uct' selects the root children
+            like any other node, and 'sequential_halving' splits the samples
+            into rounds that each drop the worse half of the root actions,
+            with UCT below the root, and returns the last action standing
+            (see _run_sequential_halving); the latter only supports the
+            serial node backend with the built-in policies and a number of
+            samples, without a transposition table, the open-loop mode,
+            early stopping, progressive widening or pondering
+        :param halving_actions: The number of root actions considered by
+            sequential halving; when the root has more, they are sampled
+            without replacement, by their priors under PUCT
+        :param rollout_horizon: When not None, the number of actions after
+            which the built-in random rollouts stop, to be scored by
+            value_estimator; by default, the rollout_horizon of the state
+            type applies (none for the included states)
+        :param value_estimator: The function that takes a state where a
+            rollout stopped and returns an estimate of its final reward;
+            defaults to the value_estimate of the state
+        :param gc_policy: The policy of the cyclic garbage collector of this
+            process during search_for_actions, among GC_POLICIES (see
+            _GcScope); the previous setting is restored after the search
         """
         if samples <= 0 or max_tree_depth <= 1:
             raise ValueError("The number of samples must be positive")
+        if workers < 1 or threads < 1:
+            raise ValueError("The number of workers must be positive")
+        if batch_size < 1:
+            raise ValueError("The batch size must be positive")
+        if tree_backend not in ('node', 'array', 'shared'):
+            raise ValueError("Unknown tree backend {0}".format(tree_backend))
+        if final_action not in FINAL_ACTION_CRITERIA:
+            raise ValueError("Unknown final action criterion {0}".format(
+                final_action))
+        if root_allocation not in ROOT_ALLOCATIONS:
+            raise ValueError("Unknown root allocation {0}".format(
+                root_allocation))
+        if gc_policy not in GC_POLICIES:
+            raise ValueError("Unknown garbage collector policy {0}".format(
+                gc_policy))
+        options = {
+            'tree_parallel': threads > 1 or batch_size > 1,
+            'threads': threads > 1, 'batch': batch_size > 1,
+            'workers': workers > 1, 'not_node': tree_backend != 'node',
+            'shared': tree_backend == 'shared',
+            'transpositions': transposition_table is not None,
+            'node_budget': max_nodes is not None or max_tree_bytes is not None,
+            'ponder': ponder, 'early_stopping': early_stopping is not None,
+            'time_budget': time_budget is not None,
+            'widening': progressive_widening is not None,
+            'rollout_cache': rollout_cache is not None,
+            'batch_rollout_policy': batch_rollout_policy is not None,
+            'open_loop': open_loop, 'priors': prior_policy is not None,
+            'rave': rave_equivalence is not None,
+            'sequential_halving': root_allocation == 'sequential_halving',
+            'custom_policies': not _uses_builtin_policies(
+                tree_select_policy, tree_expand_policy, backpropagate_method)}
+        for option, incompatible, message in _INCOMPATIBLE_OPTIONS:
+            if options[option] and any(options[other]
+                                       for other in incompatible):
+                raise ValueError(message)
+        if max_nodes is not None and max_nodes <= 1:
+            raise ValueError("The node budget must be greater than 1")
+        if time_budget is not None and time_budget <= 0:
+            raise ValueError("The time budget must be positive")
+        if early_stopping is not None and early_stopping <= 0:
+            raise ValueError("The early stopping confidence must be positive")
+        if progressive_widening is not None and (
+                progressive_widening[0] <= 0 or progressive_widening[1] < 0):
+            raise ValueError("The progressive widening parameters must be "
+                             "positive")
+        if rave_equivalence is not None and rave_equivalence <= 0:
+            raise ValueError("The RAVE equivalence must be positive")
+        if ((rollout_horizon is not None or value_estimator is not None) and
+                getattr(rollout_policy, 'func', rollout_policy) not in (
+                    random_rollout_policy, random_trace_rollout_policy)):
+            raise ValueError("The rollout horizon and value estimator only "
+                             "apply to the built-in random rollout policy")
+        if rollout_horizon is not None and rollout_horizon < 0:
+            raise ValueError("The rollout horizon cannot be negative")
+        if halving_actions < 2:
+            raise ValueError("Sequential halving needs at least 2 actions")
         self._max_samples = samples
         self._tree_select_policy = tree_select_policy
         self._tree_expand_policy = tree_expand_policy
-        self._rollout_policy = rollout_policy
+        self._rng = RandomStream(random_seed)
+        unbound_rollout_policy = (
+            random_trace_rollout_policy if rave_equivalence is not None and
+            rollout_policy is random_rollout_policy else rollout_policy)
+        if rollout_horizon is not None or value_estimator is not None:
+            unbound_rollout_policy = functools.partial(
+                unbound_rollout_policy, horizon=rollout_horizon,
+                value_estimator=value_estimator)
+        self._unbound_rollout_policy = unbound_rollout_policy
+        self._rollout_cache = rollout_cache
+        self._rollout_policy = self._rollout_policy_for(self._rng)
         self._back_propagate_policy = backpropagate_method
-        self._root = Node(initial_state)
         self._max_tree_depth = max_tree_depth
+        self._path = []  # The descent buffer reused by execute_round
+        self._num_threads = threads
+        self._virtual_loss = virtual_loss
+        self._batch_size = batch_size
+        self._batch_rollout_policy = batch_rollout_policy
+        self._search_info = {}
+        self._transpositions = None
+        self._release_pruned = release_pruned
+        self._max_nodes = max_nodes
+        self._max_tree_bytes = max_tree_bytes
+        self._num_nodes = 1
+        self._evictions = 0
+        self._time_budget = time_budget
+        self._early_stopping = early_stopping
+        self._widening = progressive_widening
+        self._open_loop = open_loop
+        self._state_cache = None
+        if open_loop and open_loop_cache_visits is not None:
+            self._state_cache = _OpenLoopStateCache(open_loop_cache_visits,
+                                                    open_loop_cache_states)
+        self._final_action = final_action
+        self._secure_const = secure_const
+        self._puct_const = None if prior_policy is None else puct_const
+        self._rave_equivalence = rave_equivalence
+        self._root_allocation = root_allocation
+        self._gc_policy = gc_policy
+        self._halving_actions = halving_actions
+        self._pool = None
+        self._root = None
+        self._tree = None
+        if tree_backend == 'shared':
+            self._pool = _SharedTreePool(workers, initial_state,
+                                         shared_capacity, max_tree_depth,
+                                         unbound_rollout_policy, virtual_loss)
+        elif workers > 1:
+            self._pool = _RootParallelPool(workers, initial_state, dict(
+                samples=samples, max_tree_depth=max_tree_depth,
+                tree_select_policy=tree_select_policy,
+                tree_expand_policy=tree_expand_policy,
+                rollout_policy=rollout_policy,
+                backpropagate_method=backpropagate_method,
+                tree_backend=tree_backend,
+                transposition_table=transposition_table,
+                release_pruned=release_pruned, max_nodes=max_nodes,
+                max_tree_bytes=max_tree_bytes,
+                progressive_widening=progressive_widening,
+                action_priority=action_priority, open_loop=open_loop,
+                open_loop_cache_visits=open_loop_cache_visits,
+                open_loop_cache_states=open_loop_cache_states,
+                prior_policy=prior_policy, puct_const=puct_const,
+                rave_equivalence=rave_equivalence,
+                root_allocation=root_allocation,
+                halving_actions=halving_actions,
+                rollout_horizon=rollout_horizon,
+                value_estimator=value_estimator))
+        elif tree_backend == 'array':
+            self._tree = ArrayTree(initial_state, rng=self._rng)
+        elif open_loop:
+            self._root = OpenLoopNode(initial_state)
+            self._update_node_budget()
+        else:
+            if prior_policy is not None:
+                make_untried = functools.partial(_PriorUntriedActions,
+                                                 prior_policy=prior_policy)
+            elif rave_equivalence is not None:
+                make_untried = _AmafUntriedActions
+            elif progressive_widening is not None:
+                make_untried = functools.partial(_LazyUntriedActions,
+                                                 priority=action_priority,
+                                                 rng=self._rng)
+            else:
+                make_untried = None
+            self._root = Node(initial_state, make_untried)
+            if transposition_table is not None:
+                self._transpositions = TranspositionTable(transposition_table)
+            self._update_node_budget()
+        self._pondered = 0
+        self._pondered_time = 0.0  # The seconds of the rounds pondered
+        self._ponder_thread = None
+        if ponder:
+            self._ponder_lock = threading.Lock()
+            self._ponder_running = threading.Event()
+            self._ponder_stopped = False
+            self._ponder_thread = threading.Thread(target=self._ponder,
+                                                   daemon=True)
+            self._ponder_running.set()
+            self._ponder_thread.start()
+
+    @property
+    def transposition_table(self):
+        # type: () -> TranspositionTable
+        """ The transposition table of the tree, or None
+        """
+        return self._transpositions
+
+    @property
+    def rollout_cache(self):
+        # type: () -> RolloutCache
+        """ The rollout cache of the tree, whose hits and misses count the
+            rollouts reused and run, or None
+        """
+        return self._rollout_cache
+
+    @property
+    def rng(self):
+        # type: () -> RandomStream
+        """ The random number generator owned by the tree
+        """
+        return self._rng
+
+    def _rollout_policy_for(self, rng):
+        # type: (RandomStream) -> callable
+        """ The rollout policy of the tree drawing from rng, through the
+            rollout cache if any
+        """
+        policy = _bind_rng(self._unbound_rollout_policy, rng)
+        if self._rollout_cache is None:
+            return policy
+        return functools.partial(self._rollout_cache.rollout, policy)
+
+    @property
+    def search_info(self):
+        # type: () -> dict
+        """ Information about the last call of search_for_actions:
+            'iterations' (the number of rounds run), 'elapsed' (the wall
+            clock time of the rounds in seconds), 'time_budget' (the
+            budget of the search, or None), 'pondered' (the number of
+            rounds run in the background on the same root before the call)
+            and 'saved' (the number of samples left in the budget when
+            early stopping ended the search, estimated from the rate of the
+            rounds with a time budget); with a rollout cache, also
+            'cache_hits' and 'cache_misses' (the rollouts reused and run
+            during the search); 'plan_confidence' is the confidence of each
+            returned action, the share of the visits of its node among its
+            siblings; 'gc_time' and 'gc_collections' are the time spent by
+            the cyclic garbage collector of this process during the search,
+            in seconds, and the number of its collections
+        """
+        return self._search_info
+
+    def _ponder(self):
+        # type: () -> None
+        """ The loop of the pondering thread, which runs one round at a time
+            while pondering is not paused
+        """
+        while True:
+            self._ponder_running.wait()
+            with self._ponder_lock:
+                if self._ponder_stopped:
+                    return
+                if not self._ponder_running.is_set():
+                    continue
+                root_state = (self._root.state if self._tree is None else
+                              self._tree.states[self._tree.root])
+                if not root_state.is_terminal:
+                    start = time.time()
+                    self._pondered += self._run_samples(1)
+                    self._pondered_time += time.time() - start
+            if root_state.is_terminal:
+                time.sleep(0.05)  # Nothing to ponder until update_root
+
+    def _pause_pondering(self):
+        # type: () -> None
+        """ Wait for the pondering thread to finish its round and keep it
+            from starting another one
+        """
+        if self._ponder_thread is not None:
+            self._ponder_running.clear()
+            self._ponder_lock.acquire()
+
+    def _resume_pondering(self):
+        # type: () -> None
+        if self._ponder_thread is not None:
+            self._ponder_lock.release()
+            self._ponder_running.set()
 
-    def _search(self, node, search_depth=1):
-        # type: (Node, int) -> (float, list)
-        """ Recursively search for a best sequence of actions
-            :return: The reward of the last (deepest child node) and the
-                     sequence of actions that leads to the optimal child node
-        """
-        if not node.children or search_depth == 0:
-            return node.tot_reward / node.num_samples, []
-        elif search_depth == 1:
-            max_val = -float('inf')
-            max_actions = []
-            for action, child in node.children.items():
-                node_val = child.tot_reward / child.num_samples
-                if node_val > max_val:
-                    max_val = node_val
-                    max_actions = [action]
-                elif node_val == max_val:
-                    max_actions.append(action)
-            max_action = random.choice(max_actions)
-            child = node.children[max_action]
-            return child.tot_reward / child.num_samples, [max_action]
-        best_reward = -math.inf
-        best_act_seq = []
-        for action, child in node.children.items():
-            child_reward, child_act_seq = self._search(child, search_depth - 1)
-            if child_reward > best_reward:
-                best_act_seq = [action] + child_act_seq
-                best_reward = child_reward
-        return best_reward, best_act_seq
-
-    def search_for_actions(self, search_depth=1, random_seed=None):
-        # type: (int, int) -> list
+    def _rollout_each(self, states):
+        # type: (list) -> list
+        return [self._rollout_policy(state) for state in states]
+
+    def _run_threads(self, samples, deadline=None):
+        # type: (int, float) -> int
+        """ Run the given number of rounds from the root, shared among the
+            tree-parallel threads, or fewer if the deadline passes
+        :return: The number of rounds run
+        """
+        remaining = [samples]
+        rounds = [0]
+        errors = []
+        counter_lock = threading.Lock()
+
+        def run(rng):
+            rollout_policy = self._rollout_policy_for(rng)
+            timer = _Deadline(deadline) if deadline is not None else None
+            while not errors:
+                with counter_lock:
+                    if remaining[0] <= 0:
+                        return
+                    remaining[0] -= 1
+                try:
+                    _tree_parallel_round(self._root, self._max_tree_depth,
+                                         rollout_policy, self._virtual_loss,
+                                         rng)
+                except Exception as error:
+                    errors.append(error)
+                with counter_lock:
+                    rounds[0] += 1
+                if timer is not None and timer.expired():
+                    return
+
+        # Each thread draws from its own stream, spawned from that of the tree
+        threads = [threading.Thread(target=run, args=(self._rng.spawn(),))
+                   for _ in range(self._num_threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+        return rounds[0]
+
+    def _run_samples(self, samples, deadline=None):
+        # type: (int, float) -> int
+        """ Run the given number of rounds from the root
+        :param deadline: When not None, the time.time() value at which the
+            rounds stop early; at least one round is run
+        :return: The number of rounds run
+        """
+        if self._num_threads > 1:
+            return self._run_threads(samples, deadline)
+        timer = _Deadline(deadline) if deadline is not None else None
+        rounds = 0
+        if self._batch_size > 1:
+            evaluate = self._batch_rollout_policy or self._rollout_each
+            for start in range(0, samples, self._batch_size):
+                batch_size = min(self._batch_size, samples - start)
+                _batched_round(self._root, self._max_tree_depth, evaluate,
+                               batch_size, self._virtual_loss, self._rng)
+                rounds += batch_size
+                if timer is not None and timer.expired():
+                    break
+            return rounds
+        if self._tree is not None:
+            for _ in range(samples):
+                self._tree.execute_round(
+                    max_tree_depth=self._max_tree_depth,
+                    rollout_policy=self._rollout_policy)
+                rounds += 1
+                if timer is not None and timer.expired():
+                    break
+            return rounds
+        for _ in range(samples):
+            self._node_round(self._root, self._max_tree_depth)
+            rounds += 1
+            if timer is not None and timer.expired():
+                break
+        return rounds
+
+    def _node_round(self, root, max_tree_depth):
+        # type: (Node, int) -> None
+        """ One round of the serial node backend from root, which is the root
+            of the tree or, for sequential halving, one of its children
+        """
+        if self._open_loop:
+            node = _open_loop_round(root, max_tree_depth,
+                                    self._rollout_policy, self._path,
+                                    self._state_cache, self._rng)
+        elif self._puct_const is not None:
+            node = _puct_round(root, max_tree_depth, self._rollout_policy,
+                               self._path, self._puct_const, self._rng)
+        elif self._rave_equivalence is not None:
+            node = _rave_round(root, max_tree_depth, self._rollout_policy,
+                               self._path, self._rave_equivalence, self._rng)
+        else:
+            node = execute_round(
+                root, max_tree_depth=max_tree_depth,
+                tree_select_policy=self._tree_select_policy,
+                tree_expand_policy=self._tree_expand_policy,
+                rollout_policy=self._rollout_policy,
+                backpropagate_method=self._back_propagate_policy,
+                path=self._path, transpositions=self._transpositions,
+                widening=self._widening, rng=self._rng)
+        # The root of the round is already counted, even on its first round
+        if node.num_samples == 1 and node is not root:  # New node
+            self._num_nodes += 1
+            if (self._max_nodes is not None and
+                    self._num_nodes > self._max_nodes):
+                self._evict()
+
+    def _halving_candidates(self, num_candidates):
+        # type: (int) -> list
+        """ The root children considered by sequential halving: at most
+            num_candidates of the root actions, sampled without replacement
+            (by the Gumbel top-k trick, weighted by the priors under PUCT);
+            the children are added to the root as needed
+        """
+        root = self._root
+        edges = root._untried_edges
+        if isinstance(edges, _PriorUntriedActions):
+            actions = edges._actions
+            logits = np.log(np.maximum(edges.priors, 1e-12))
+        else:
+            actions = root.state.possible_actions
+            logits = np.zeros(len(actions))
+        if len(actions) > num_candidates:
+            uniforms = np.array([self._rng.random() for _ in actions])
+            gumbels = -np.log(-np.log(np.clip(uniforms, 1e-12, 1 - 1e-12)))
+            top = np.argsort(-(logits + gumbels))[:num_candidates]
+            actions = [actions[k] for k in top]
+        candidates = []
+        for action in actions:
+            child = root.children.get(action)
+            if child is None:
+                child = root.add_child(action)
+                self._num_nodes += 1
+            candidates.append(child)
+        return candidates
+
+    def _run_sequential_halving(self, samples):
+        # type: (int) -> (int, AbstractAction)
+        """ Allocate the samples among the root actions by sequential
+            halving: the samples are split into ceil(log2(m)) rounds for m
+            candidate actions, every round spreads its share evenly among the
+            remaining candidates, running UCT rounds in the subtree of each,
+            and keeps the better half of them by mean reward; the last round
+            also spreads what the earlier ones left, so that exactly samples
+            rounds are run
+            There are at most as many candidates as samples, so that each
+            of them is sampled in the first round
+            The samples below a candidate are added to the root statistics;
+            when the root has a single action, the samples are run from the
+            root
+        :return: The number of rounds run and the last action standing, or
+            None when the root has no action
+        """
+        root = self._root
+        if len(root.children) + len(root._untried_edges) == 1:
+            # There is nothing to halve: the rounds from the root expand the
+            # action if needed, and then select it
+            for _ in range(samples):
+                self._node_round(root, self._max_tree_depth)
+            return samples, next(iter(root.children))
+        candidates = self._halving_candidates(min(self._halving_actions,
+                                                  samples))
+        if not candidates:
+            return 0, None
+        # The samples of the root that are not in its children, such as the
+        # one of its own expansion, which the halving leaves unchanged
+        own_samples = root.num_samples - sum(
+            child.num_samples for child in root.children.values())
+        num_phases = max(1, int(math.ceil(math.log(len(candidates), 2))))
+        rounds = 0
+        for phase in range(num_phases):
+            if rounds >= samples:
+                break
+            if phase == num_phases - 1:
+                share, extra = divmod(samples - rounds, len(candidates))
+            else:
+                share, extra = max(1, (samples - rounds) //
+                                   (len(candidates) * (num_phases - phase))), 0
+            for k, child in enumerate(candidates):
+                child_rounds = min(share + (k < extra), samples - rounds)
+                before = (child.num_samples, child.tot_reward,
+                          child.tot_sq_reward)
+                for _ in range(child_rounds):
+                    self._node_round(child, self._max_tree_depth - 1)
+                root.num_samples += child.num_samples - before[0]
+                root.tot_reward += child.tot_reward - before[1]
+                root.tot_sq_reward += child.tot_sq_reward - before[2]
+                rounds += child_rounds
+            means = np.array([child.tot_reward / max(child.num_samples, 1)
+                              for child in candidates])
+            ties = np.array([self._rng.random() for _ in candidates])
+            order = np.lexsort((ties, means))[::-1]
+            candidates = [candidates[k] for k in
+                          order[:max(1, (len(candidates) + 1) // 2)]]
+        if root.num_samples - own_samples != sum(
+                child.num_samples for child in root.children.values()):
+            raise RuntimeError("The root samples do not add up to the "
+                               "samples of its children after sequential "
+                               "halving")
+        return rounds, candidates[0]._action
+
+    def _root_children_statistics(self):
+        # type: () -> (np.ndarray, np.ndarray, np.ndarray, np.ndarray, bool)
+        """ The actions, visits, total rewards and sums of squared rewards of
+            the root children, and whether the root has untried actions that
+            may still be expanded; the array backend returns views of its
+            arrays
+        """
+        if self._tree is not None:
+            tree = self._tree
+            children = tree.children(tree.root)
+            window = slice(children.start, children.stop)
+            return (np.fromiter(tree.actions[window], dtype=object,
+                                count=len(children)),
+                    tree.visits[window], tree.rewards[window],
+                    tree.sq_rewards[window], bool(tree.untried[tree.root]))
+        root = self._root
+        actions = np.fromiter(root.children, dtype=object,
+                              count=len(root.children))
+        children = list(root.children.values())
+        if self._open_loop:
+            untried = (not root.state.is_terminal and
+                       len(children) < len(root.state.possible_actions))
+        else:
+            untried = ((self._widening is None or
+                        len(children) < _widening_limit(
+                            self._widening, root.num_samples)) and
+                       bool(root.unused_edges))
+        return (actions,
+                np.array([child.num_samples for child in children],
+                         dtype=np.float64),
+                np.array([child.tot_reward for child in children],
+                         dtype=np.float64),
+                np.array([child.tot_sq_reward for child in children],
+                         dtype=np.float64),
+                untried)
+
+    def _run_until_settled(self, samples, deadline=None):
+        # type: (int, float) -> (int, float)
+        """ Run rounds like _run_samples, and stop early as soon as the root
+            decision is settled; the rule is checked every
+            _EARLY_STOP_INTERVAL rounds
+        :return: The number of rounds run and the number of rounds saved
+        """
+        rounds = 0
+        start = time.time()
+        while rounds < samples:
+            rounds += self._run_samples(
+                min(_EARLY_STOP_INTERVAL, samples - rounds), deadline)
+            if deadline is None:
+                remaining = samples - rounds
+            else:
+                now = time.time()
+                if now >= deadline:
+                    break
+                remaining = rounds * (deadline - now) / max(now - start, 1e-9)
+            _, visits, rewards, sq_rewards, untried = (
+                self._root_children_statistics())
+            if remaining > 0 and _decision_settled(
+                    visits, rewards, sq_rewards, remaining,
+                    self._early_stopping, untried):
+                return rounds, remaining
+        return rounds, 0
+
+    @property
+    def num_nodes(self):
+        # type: () -> int
+        """ The number of nodes under the root, as tracked by the serial
+            node backend
+        """
+        return self._num_nodes
+
+    @property
+    def num_evictions(self):
+        # type: () -> int
+        """ The number of nodes evicted to stay within the node budget
+        """
+        return self._evictions
+
+    def _count_nodes(self, root=None):
+        # type: (Node) -> int
+        """ The number of nodes under root (the root of the tree by default),
+            root included, by a walk of the subtree
+        """
+        return len(self._node_ids(root))
+
+    def _node_ids(self, root=None):
+        # type: (Node) -> set
+        """ The ids of the nodes under root (the root of the tree by
+            default), root included
+        """
+        seen = set()
+        stack = [self._root if root is None else root]
+        while stack:
+            node = stack.pop()
+            if id(node) not in seen:
+                seen.add(id(node))
+                stack.extend(node.children.values())
+        return seen
+
+    def _update_node_budget(self):
+        # type: () -> None
+        """ Convert the byte budget into a node budget, from the estimated
+            size of the root and its state
+        """
+        if self._max_tree_bytes is not None:
+            self._max_nodes = max(2, self._max_tree_bytes //
+                                  _estimate_node_bytes(self._root))
+
+    def _evict(self):
+        # type: () -> None
+        """ Evict the least-visited leaves until the tree is back to 90% of
+            the node budget; when all leaves are evicted, their parents
+            become leaves for the next pass
+            The statistics of an evicted leaf are already folded into its
+            parent by backpropagation; its action goes back to the untried
+            actions of the parent (implicitly for open-loop nodes), so that
+            it can be expanded again
+        """
+        target = max(1, int(self._max_nodes * 0.9))
+        while self._num_nodes > target:
+            leaves = []
+            stack = [self._root]
+            while stack:
+                node = stack.pop()
+                for action, child in node.children.items():
+                    if child.children:
+                        stack.append(child)
+                    elif (node is not self._root or self._root_allocation !=
+                          'sequential_halving'):
+                        # The candidates of sequential halving stay
+                        leaves.append((child.num_samples, len(leaves),
+                                       node, action))
+            if not leaves:
+                break
+            leaves.sort(key=lambda leaf: leaf[:2])
+            for _, _, parent, action in leaves[:self._num_nodes - target]:
+                child = parent.children.pop(action)
+                if not self._open_loop:
+                    child._parent = None
+                    parent._untried_edges.append(action)
+                self._num_nodes -= 1
+                self._evictions += 1
+
+    def _child_statistics(self, path):
+        # type: (list) -> list
+        """ The statistics of the children of the node reached from the root
+            by the sequence of actions in path
+        :return: A list of (action, num_samples, tot_reward); empty when the
+            node has not been expanded in this tree
+        """
+        if self._tree is not None:
+            tree = self._tree
+            index = tree.root
+            for action in path:
+                index = tree.child_by_action(index, action)
+                if index < 0:
+                    return []
+            return [(tree.actions[child], int(tree.visits[child]),
+                     float(tree.rewards[child]))
+                    for child in tree.children(index)]
+        node = self._root
+        for action in path:
+            node = node.children.get(action)
+            if node is None:
+                return []
+        return [(action, child.num_samples, child.tot_reward)
+                for action, child in node.children.items()]
+
+    def _node_children(self, node):
+        # type: (Node) -> list
+        return [(action, child, child.num_samples, child.tot_reward)
+                for action, child in node.children.items()]
+
+    def _array_children(self, index):
+        # type: (int) -> list
+        tree = self._tree
+        return [(tree.actions[child], child, int(tree.visits[child]),
+                 float(tree.rewards[child]))
+                for child in tree.children(index)]
+
+    def _merged_children(self, path):
+        # type: (tuple) -> list
+        """ The children of the node reached by path, from the statistics
+            merged over the root-parallel workers (or read from the shared
+            tree)
+        """
+        return [(action, path + (action,), num_samples, tot_reward)
+                for action, (num_samples, tot_reward) in
+                self._pool.child_statistics(list(path)).items()]
+
+    def root_statistics(self):
+        # type: () -> RootStatistics
+        """ The statistics of the root children as aligned NumPy arrays: the
+            actions (an object array), the visit counts, the mean rewards
+            and the variances of the rewards
+            The array backend reads them off its arrays without per-node
+            Python work; the root-parallel and shared-tree backends only
+            merge visits and total rewards, so their variances are NaN
+        """
+        if self._pool is not None:
+            merged = self._pool.child_statistics([])
+            actions = np.fromiter(merged, dtype=object, count=len(merged))
+            totals = np.array(list(merged.values()),
+                              dtype=np.float64).reshape(-1, 2)
+            visits, rewards = totals[:, 0], totals[:, 1]
+            variances = np.full(len(merged), np.nan)
+        else:
+            actions, visits, rewards, sq_rewards, _ = (
+                self._root_children_statistics())
+            visits = visits.astype(np.float64)
+            variances = None
+        means = rewards / visits
+        if variances is None:
+            variances = np.maximum(sq_rewards / visits - means * means, 0.0)
+        return RootStatistics(actions, visits.astype(np.int64), means,
+                              variances)
+
+    def _plan(self, search_depth=1, min_visits=_PLAN_MIN_VISITS,
+              beam_width=1, root_action=None):
+        # type: (int, int, int, AbstractAction) -> (list, list)
+        """ The best sequence of actions and the confidence of each step:
+            the root action is root_action when given (by sequential
+            halving), or chosen by the final-action criterion of the tree
+            otherwise, and the rest of the plan is extracted below it (see
+            _extract_plan)
+        """
+        if search_depth <= 0:
+            return [], []
+        stats = self.root_statistics()
+        if not len(stats.actions):
+            return [], []
+        if root_action is not None:
+            k = next(k for k, action in enumerate(stats.actions)
+                     if action == root_action)
+        else:
+            k = _final_action_index(stats.visits, stats.means,
+                                    self._final_action, self._secure_const,
+                                    self._rng)
+        action = stats.actions[k]
+        confidence = float(stats.visits[k] / stats.visits.sum())
+        if self._pool is not None:
+            child, children_of = (action,), self._merged_children
+        elif self._tree is not None:
+            child = self._tree.child_start[self._tree.root] + k
+            children_of = self._array_children
+        else:
+            child = self._root.children[action]
+            children_of = self._node_children
+        actions, confidences = _extract_plan(
+            child, children_of, search_depth - 1, min_visits, beam_width,
+            self._rng)
+        return [action] + actions, [confidence] + confidences
+
+    def search_for_actions(self, search_depth=1, random_seed=None,
+                           time_budget=None, min_visits=_PLAN_MIN_VISITS,
+                           beam_width=1):
+        # type: (int, int, float, int, int) -> list
         """ With given initial state, obtain the best actions to take by MCTS
-        :param search_depth: How many steps of actions are wanted
-        :param random_seed: When not None, set the random seed before running
+        :param search_depth: How many steps of actions are wanted at most;
+            the first action is chosen by the final-action criterion of the
+            tree, and the next ones follow the most visited children (see
+            _extract_plan)
+        :param random_seed: When not None, reseed the random number generator
+            of the tree (not the global random module) before running
+        :param time_budget: When not None, search for this number of seconds
+            instead of the given number of samples, and return the best
+            actions found when the time is up; defaults to the time budget
+            of the tree; the number of rounds run is in search_info
+            When pondering, only the samples (or the seconds of the time
+            budget) missing from the rounds pondered on the root are run,
+            so the call returns at once when the pondering covered them
+        :param min_visits: The number of visits a node needs to extend the
+            plan beyond the first action; the plan is cut short at the
+            first under-sampled step, and the confidence of every step is
+            in search_info
+        :param beam_width: The number of sequences kept at every step of the
+            extraction
         :return: The best actions
         :rtype: A list of AbstractAction objects
         """
-        if random_seed is not None:
-            random.seed(random_seed)
-        for _ in range(self._max_samples):
-            execute_round(self._root, max_tree_depth=self._max_tree_depth,
-                          tree_select_policy=self._tree_select_policy,
-                          tree_expand_policy=self._tree_expand_policy,
-                          rollout_policy=self._rollout_policy,
-                          backpropagate_method=self._back_propagate_policy)
-        return self._search(self._root, search_depth)[1]
+        self._pause_pondering()
+        try:
+            if random_seed is not None:
+                self._rng.seed(random_seed)
+            if time_budget is None:
+                time_budget = self._time_budget
+            start = time.time()
+            if time_budget is None:
+                deadline = None
+                samples = max(0, self._max_samples - self._pondered)
+            else:
+                remaining = time_budget - self._pondered_time
+                deadline = start + remaining
+                samples = sys.maxsize if remaining > 0 else 0
+            saved = 0
+            root_action = None
+            cache = self._rollout_cache
+            if cache is not None:
+                hits, misses = cache.hits, cache.misses
+            with _GcScope(self._gc_policy) as gc_scope:
+                if self._pool is not None:
+                    iterations = self._pool.search(
+                        samples, self._rng.getrandbits(32), deadline)
+                elif self._early_stopping is not None:
+                    iterations, saved = self._run_until_settled(samples,
+                                                                deadline)
+                elif self._root_allocation == 'sequential_halving':
+                    if deadline is not None:
+                        raise ValueError("Sequential halving needs a number "
+                                         "of samples instead of a time "
+                                         "budget")
+                    iterations, root_action = self._run_sequential_halving(
+                        samples)
+                else:
+                    iterations = self._run_samples(samples, deadline)
+            self._search_info = {'iterations': iterations,
+                                 'elapsed': time.time() - start,
+                                 'time_budget': time_budget,
+                                 'pondered': self._pondered,
+                                 'saved': int(saved),
+                                 'gc_time': gc_scope.elapsed,
+                                 'gc_collections': gc_scope.collections}
+            if cache is not None:
+                self._search_info['cache_hits'] = cache.hits - hits
+                self._search_info['cache_misses'] = cache.misses - misses
+            self._pondered = 0
+            self._pondered_time = 0.0
+            actions, confidences = self._plan(search_depth, min_visits,
+                                              beam_width, root_action)
+            self._search_info['plan_confidence'] = confidences
+            return actions
+        finally:
+            self._resume_pondering()
 
     def update_root(self, action):
         # type: (AbstractAction) -> MonteCarloSearchTree
         """ Update the root node to reflect the new state after an action is
-            taken
+            taken; the subtree of the new root is kept, and the rest of the
+            tree is released when release_pruned is set
         :param action: The action that brings a new state
         """
-        if action in self._root.children:
+        self._pause_pondering()
+        try:
+            if self._pool is not None:
+                self._pool.update_root(action)
+            elif self._tree is not None:
+                self._tree.reroot(action)
+            else:
+                self._update_node_root(action)
+        finally:
+            self._pondered = 0
+            self._pondered_time = 0.0
+            self._resume_pondering()
+        return self
+
+    def _update_node_root(self, action):
+        # type: (AbstractAction) -> None
+        # The node count is kept by subtracting the pruned part of the tree,
+        # which is walked anyway to be released, instead of walking the kept
+        # part; the tree-parallel and batched modes do not track the count,
+        # so it is recounted there
+        tracked = self._num_threads == 1 and self._batch_size == 1
+        kept = action in self._root.children
+        if self._open_loop:
+            # The pruned nodes are freed with the old root by reference
+            # counting
+            new_root = self._root.children.pop(action, None)
+            if new_root is None:
+                new_root = OpenLoopNode()
+            if new_root.state is None:
+                new_root.state = self._root.state.execute_action(action)
+            pruned = self._node_ids(self._root)
+            if self._state_cache is not None:
+                # The states of the pruned nodes go with them, and the new
+                # root keeps its state for good
+                self._state_cache.drop(pruned)
+                self._state_cache.drop((id(new_root),))
+            self._root = new_root
+            self._num_nodes = self._num_nodes - len(pruned) if kept else 1
+            return
+        if kept:
             new_root = self._root.children[action]
         else:
             new_root = self._root.add_child(action)
         self._root.remove_child(new_root)
-        self._root = new_root
-        return self
+        if self._transpositions is not None:
+            # The pruned nodes may be shared with the new subtree, so only
+            # the links of the old root are dropped, and the table keeps the
+            # entries of the nodes still reachable
+            if self._release_pruned:
+                self._root.children = {}
+            self._root = new_root
+            self._num_nodes = self._transpositions.retain(new_root)
+        else:
+            pruned = (self._root.release() if self._release_pruned else
+                      self._count_nodes(self._root))
+            self._root = new_root
+            if not tracked:
+                self._num_nodes = self._count_nodes()
+            else:
+                self._num_nodes = self._num_nodes - pruned if kept else 1
+        self._update_node_budget()
+
+    def close(self):
+        # type: () -> None
+        """ Stop the worker processes of a root-parallel or shared-tree
+            search (and free the shared memory), or the pondering thread
+        """
+        if self._pool is not None:
+            self._pool.close()
+        if self._ponder_thread is not None:
+            with self._ponder_lock:
+                self._ponder_stopped = True
+            self._ponder_running.set()
+            self._ponder_thread.join()
+            self._ponder_thread = None
+
+
+# The share of the deadline of a query that a worker spends searching,
+# which leaves the rest for its last report to reach the coordinator, and
+# the share of the deadline between two reports of a worker
+_WORKER_DEADLINE_SHARE = 0.8
+_WORKER_REPORT_SHARE = 0.1
+
+
+def _serve_coordinator(connection, report_every, tree_kwargs):
+    # type: (multiprocessing.connection.Connection, int, dict) -> bool
+    """ Answer the search queries of one coordinator connection
+        A query with a deadline is searched until _WORKER_DEADLINE_SHARE of
+        it has passed on the clock of the worker, with a report at least
+        every _WORKER_REPORT_SHARE of it
+    :return: False if the coordinator asked the worker to shut down
+    """
+    with connection:
+        while True:
+            try:
+                message = connection.recv()
+            except EOFError:
+                return True
+            if message[0] == 'shutdown':
+                return False
+            elif message[0] != 'search':
+                continue
+            _, query, state, samples, seed, deadline = message
+            start = time.time()
+            stop = (None if deadline is None else
+                    start + deadline * _WORKER_DEADLINE_SHARE)
+            tree = MonteCarloSearchTree(state, samples=max(samples, 1),
+                                        random_seed=seed, **tree_kwargs)
+            done = 0
+            finished = False
+            while not finished:
+                chunk = min(report_every, samples - done)
+                if chunk > 0:
+                    done += tree._run_samples(chunk, None if stop is None else
+                                              min(stop, time.time() +
+                                                  deadline *
+                                                  _WORKER_REPORT_SHARE))
+                finished = done >= samples or (stop is not None and
+                                               time.time() >= stop)
+                if connection.poll() and connection.recv()[0] == 'stop':
+                    finished = True
+                connection.send(('stats', query, done,
+                                 tree._child_statistics([]), finished))
+
+
+def serve_search_worker(address, authkey, ready=None, report_every=50,
+                        **tree_kwargs):
+    # type: (tuple, bytes, multiprocessing.connection.Connection, int, dict) -> None
+    """ Serve searches for a SearchCoordinator over TCP until the
+        coordinator sends a shutdown
+        For every query, the worker grows a fresh tree from the shipped root
+        state and streams the root child statistics back every report_every
+        samples, until its budget is spent, its share of the deadline of
+        the query has passed, or the coordinator stops it
+    :param address: The (host, port) to listen on; port 0 picks a free port
+    :param authkey: The secret key shared with the coordinator, such as
+        os.urandom(32); the messages are pickled, so anyone holding the key
+        can run code on the worker
+    :param ready: When not None, the bound address is sent through it once
+        the worker is listening
+    :param report_every: The number of samples between two reports
+    :param tree_kwargs: Other arguments of MonteCarloSearchTree, such as the
+        rollout policy, which stay on the worker
+    """
+    if not authkey:
+        raise ValueError("A secret authkey is required")
+    listener = Listener(address, authkey=authkey)
+    if ready is not None:
+        ready.send(listener.address)
+        ready.close()
+    try:
+        while _serve_coordinator(listener.accept(), report_every,
+                                 tree_kwargs):
+            pass
+    finally:
+        listener.close()
+
+
+def start_local_workers(num_workers, authkey, **worker_kwargs):
+    # type: (int, bytes, dict) -> (list, list)
+    """ Start search workers as local processes listening on 127.0.0.1,
+        which stand in for remote hosts
+    :param authkey: The secret key shared with the coordinator
+    :param worker_kwargs: Other arguments of serve_search_worker
+    :return: The processes and their addresses
+    """
+    processes = []
+    addresses = []
+    for _ in range(num_workers):
+        connection, worker_connection = multiprocessing.Pipe()
+        kwargs = dict(worker_kwargs, address=('127.0.0.1', 0),
+                      authkey=authkey, ready=worker_connection)
+        process = multiprocessing.Process(target=serve_search_worker,
+                                          kwargs=kwargs, daemon=True)
+        process.start()
+        worker_connection.close()
+        addresses.append(connection.recv())
+        connection.close()
+        processes.append(process)
+    return processes, addresses
+
+
+class SearchCoordinator(object):
+    def __init__(self, addresses, authkey):
+        # type: (list, bytes) -> None
+        """ Connect to search workers (see serve_search_worker), possibly on
+            other hosts, to spread a planning query over them
+        :param addresses: The (host, port) of each worker
+        :param authkey: The secret key shared with the workers
+        """
+        if not authkey:
+            raise ValueError("A secret authkey is required")
+        self._connections = [Client(tuple(address), authkey=authkey)
+                             for address in addresses]
+        self._query = 0
+        self._search_info = {}
+        self._rng = RandomStream()
+
+    @property
+    def search_info(self):
+        # type: () -> dict
+        """ Information about the last query: 'iterations' (the samples
+            reported back), 'elapsed', and 'stragglers' (the number of
+            workers cut off at the deadline)
+        """
+        return self._search_info
+
+    def search(self, state, samples=1000, deadline=None, random_seed=None):
+        # type: (AbstractState, int, float, int) -> dict
+        """ Ship the root state and a share of the sample budget to every
+            worker, and merge the root child statistics they stream back
+        :param deadline: When not None, the number of seconds after which
+            the workers that have not finished are stopped and their last
+            report is used; the workers are told the deadline and report
+            before it on their own
+        :param random_seed: When not None, reseed the random number generator
+            of the coordinator before drawing the worker seeds
+        :return: {AbstractAction: [num_samples, tot_reward]}
+        """
+        if random_seed is not None:
+            self._rng.seed(random_seed)
+        self._query += 1
+        start = time.time()
+        seed = self._rng.getrandbits(32)
+        share, remainder = divmod(samples, len(self._connections))
+        for i, connection in enumerate(self._connections):
+            connection.send(('search', self._query, state,
+                             share + (i < remainder), seed + i, deadline))
+        reports = {}
+        pending = set(self._connections)
+        while pending:
+            timeout = (None if deadline is None else
+                       max(0.0, start + deadline - time.time()))
+            ready = wait(list(pending), timeout)
+            if not ready:
+                break
+            for connection in ready:
+                try:
+                    _, query, done, stats, finished = connection.recv()
+                except EOFError:
+                    pending.discard(connection)
+                    continue
+                if query != self._query:
+                    continue  # A late report of an earlier query
+                reports[connection] = (done, stats)
+                if finished:
+                    pending.discard(connection)
+        for connection in pending:
+            connection.send(('stop', self._query))
+        self._search_info = {
+            'iterations': sum(done for done, _ in reports.values()),
+            'elapsed': time.time() - start, 'stragglers': len(pending)}
+        return _merge_child_statistics(stats for _, stats in reports.values())
+
+    def search_for_actions(self, state, samples=1000, deadline=None,
+                           random_seed=None):
+        # type: (AbstractState, int, float, int) -> list
+        """ The best action at state by the merged root child statistics
+        :return: A list with the best action, or an empty list if no worker
+            reported in time
+        """
+        merged = self.search(state, samples, deadline, random_seed)
+        return [_best_merged_action(merged, self._rng)] if merged else []
+
+    def close(self, shutdown=False):
+        # type: (bool) -> None
+        """ Disconnect from the workers
+        :param shutdown: Whether to also stop the worker processes
+        """
+        for connection in self._connections:
+            if shutdown:
+                connection.send(('shutdown',))
+            connection.close()
+        self._connections = []
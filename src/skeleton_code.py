@@ -21,18 +21,29 @@ class MctsNode:
 
         self.kolumbo_state = KolumboState(time_remains=20.0)
 
-        self.kolumbo_mcts = MonteCarloSearchTree(
-            self.kolumbo_state, samples=1000, max_tree_depth=5,
+        self.kolumbo_mcts = self.new_mcts(self.kolumbo_state)
+
+    def new_mcts(self, kolumbo_state):
+        return MonteCarloSearchTree(
+            kolumbo_state, samples=1000, max_tree_depth=5,
             tree_select_policy=select, tree_expand_policy=expand,
             rollout_policy=random_rollout_policy,
-            backpropagate_method=backpropagate)
+            backpropagate_method=backpropagate,
+            time_budget=0.5,  # Leave room in the 1 Hz loop
+            ponder=True, max_nodes=200000)
 
     def cb_map(self, msg):
         json_map = json.loads(msg.data)
 
-        self.kolumbo_state.reset_environment()
+        # The pondering thread reads the state of the tree, so a new map is
+        # parsed into a new state, searched by a new tree
+        kolumbo_state = KolumboState(time_remains=20.0)
+        kolumbo_state.reset_environment()
+        kolumbo_state.json_parse_to_map(json_map)
 
-        self.kolumbo_state.json_parse_to_map(json_map)
+        self.kolumbo_mcts.close()
+        self.kolumbo_state = kolumbo_state
+        self.kolumbo_mcts = self.new_mcts(kolumbo_state)
 
         # publish it
         self.publish_action()
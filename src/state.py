@@ -15,6 +15,10 @@ class AbstractAction:
 class AbstractState:
     __metaclass__ = ABCMeta
 
+    # The number of actions after which a random rollout from a state of the
+    # type stops and scores the state with value_estimate; None for no limit
+    rollout_horizon = None
+
     @property
     def reward(self):
         # type: () -> float
@@ -43,6 +47,48 @@ class AbstractState:
         """
         raise NotImplementedError("The method not implemented")
 
+    @property
+    def supports_inplace(self):
+        # type: () -> bool
+        """ Whether the state implements apply_inplace and undo, which let a
+            rollout mutate a single scratch copy instead of copying the
+            state at every step
+        """
+        return False
+
+    def apply_inplace(self, action):
+        # type: (AbstractAction) -> AbstractState
+        """ Execute the specified action on the state itself, and remember
+            how to revert it with undo
+        :param action
+        :return: The state
+        """
+        raise NotImplementedError("The method not implemented")
+
+    def undo(self):
+        # type: () -> AbstractState
+        """ Revert the last action executed by apply_inplace
+        :return: The state
+        """
+        raise NotImplementedError("The method not implemented")
+
+    def value_estimate(self):
+        # type: () -> float
+        """ An estimate of the final reward from this state, used to score
+            the non-terminal state where a truncated rollout stops
+        :return: The reward of the state by default
+        """
+        return self.reward
+
+    def state_key(self):
+        # type: () -> object
+        """ A hashable key such that two states with equal keys have the
+            same reward and the same future, whatever actions led to them;
+            it lets the search tree share the statistics of such states
+        :return: The key
+        """
+        raise NotImplementedError("The method not implemented")
+
 
 class KolumboAction(AbstractAction):
     def __init__(self, agent_id, start_loc, end_loc, time_duration):
@@ -72,6 +118,19 @@ class KolumboAction(AbstractAction):
         # type: () -> float
         return self._time
 
+    def __eq__(self, other):
+        # type: (KolumboAction) -> bool
+        return (self.__class__ == other.__class__ and
+                self._agent_id == other._agent_id and
+                self._start_location == other._start_location and
+                self._end_location == other._end_location and
+                self._time == other._time)
+
+    def __hash__(self):
+        # type: () -> int
+        return hash((self._agent_id, self._start_location, self._end_location,
+                     self._time))
+
     def __str__(self):
         # type: () -> str
         return "Action: agent {0} move from location {1} to location {2} " \
@@ -97,17 +156,20 @@ class KolumboState(AbstractState):
         self._environment = environment
         self._time_remains = time_remains
         self._agent_id = 0  # The index for the agent that should take action
+        self._undo_stack = []  # The records of apply_inplace
 
     def __copy__(self):
         # type: () -> KolumboState
         """ Make a copy of the state; histories, statuses and terminal_locations
-            are copied by value
+            are copied by value, and the actions applied in place are not
+            recorded in the copy
         """
         new_state = KolumboState(environment=self._environment,
                                  time_remains=self._time_remains)
         new_state._histories = deepcopy(self._histories)
         new_state._statuses = deepcopy(self._statuses)
         new_state._terminal_locations = deepcopy(self._terminal_locations)
+        new_state._agent_id = self._agent_id
         return new_state
 
     def __str__(self):
@@ -387,6 +449,49 @@ class KolumboState(AbstractState):
                               self.cost_at_path(*path))
                 for path in self.outgoing_paths(start_loc)]
 
+    def action_priority(self, action):
+        # type: (KolumboAction) -> float
+        """ A cheap priority of an action for progressive widening: the
+            reward at the goal location (none if already visited) per unit
+            of cost
+        """
+        goal = action.goal_location
+        if any(goal in history for history in self._histories):
+            return 0.0
+        reward = self._environment.nodes[goal].get('reward', 0.0)
+        return reward / max(action.time_duration, 1e-6)
+
+    def value_estimate(self, reachable_weight=1.0):
+        # type: (float) -> float
+        """ An optimistic estimate of the final reward for truncated
+            rollouts: the reward at the visited locations, plus
+            reachable_weight times the reward at the unvisited locations
+            that some agent can still reach within the remaining time
+            (ignoring the recovery at a terminal location)
+        """
+        rewards = self.rewards_at_all_locations
+        visited = self.visited
+        reachable = set()
+        for agent in self.nonterminal_agents:
+            _, end_loc, time_to_end = self._statuses[agent]
+            if time_to_end <= self._time_remains:
+                reachable.update(nx.single_source_dijkstra_path_length(
+                    self._environment, end_loc,
+                    cutoff=self._time_remains - time_to_end, weight='cost'))
+        return (sum(reward for loc, reward in rewards.items()
+                    if loc in visited) +
+                reachable_weight * sum(rewards.get(loc, 0.0)
+                                       for loc in reachable - visited))
+
+    def state_key(self):
+        # type: () -> tuple
+        """ The statuses of the agents, the agent to move, the remaining time
+            and the visited locations; the order of the visits does not
+            matter
+        """
+        return (tuple(self._statuses), self._agent_id, self._time_remains,
+                frozenset(self.visited))
+
     def execute_action(self, action):
         # type: (KolumboAction) -> KolumboState
         """ Execute the action on a copy of the current state
@@ -400,6 +505,40 @@ class KolumboState(AbstractState):
         new_state.evolve()
         return new_state
 
+    @property
+    def supports_inplace(self):
+        # type: () -> bool
+        return True
+
+    def apply_inplace(self, action):
+        # type: (KolumboAction) -> KolumboState
+        """ Execute the action on the state itself; only the statuses, the
+            agent to move, the remaining time and the history lengths are
+            recorded for undo, instead of deep-copying the state
+        """
+        self._undo_stack.append((tuple(self._statuses), self._agent_id,
+                                 self._time_remains,
+                                 tuple(len(history)
+                                       for history in self._histories)))
+        self._statuses[action.agent_index] = (action.start_location,
+                                              action.goal_location,
+                                              action.time_duration)
+        self.evolve()
+        return self
+
+    def undo(self):
+        # type: () -> KolumboState
+        """ Revert the last action executed by apply_inplace
+        """
+        if not self._undo_stack:
+            raise ValueError("No action to undo")
+        statuses, self._agent_id, self._time_remains, lengths = (
+            self._undo_stack.pop())
+        self._statuses[:] = statuses
+        for history, length in zip(self._histories, lengths):
+            del history[length:]
+        return self
+
     def visualize(self, file_name=None, fig_size=(8, 6.5), buffer_size=0.10,
                   max_reward_radius=0.35, min_reward_radius=0.15,
                   visited_reward_transparency=0.25, trajectory_width=0.06,